@@ -0,0 +1,332 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Benchmarks for Project Timesheets on a synthetic data set.
+
+For each size, N employees x D days of submitted sheets with R rows each are
+generated directly in the database, then the lifecycle of a new sheet
+(validate, submit, cancel) and each report are timed against that volume.
+Results are written as JSON, so runs of different versions can be compared.
+
+Use a disposable site: the rollup and interval tables are rebuilt from scratch.
+
+	bench --site bench.local benchmark-timesheets --company "Bench Co"
+"""
+
+import json
+import math
+import statistics
+import time
+
+import frappe
+from frappe.utils import add_days, getdate, now, nowdate
+
+import cmecustom
+from cmecustom.cmecustom.doctype.project_timesheet_interval.project_timesheet_interval import (
+	INTERVAL_FIELDS,
+	get_interval_values,
+)
+from cmecustom.cmecustom.doctype.project_timesheet_rollup.project_timesheet_rollup import rebuild_rollup
+from cmecustom.cmecustom.timesheet_hours import calculate_row_hours
+
+# Detail rows of the generated data sets
+SIZES = (10_000, 100_000, 1_000_000)
+
+# Prefix of every generated document name
+DATA_PREFIX = "BENCH"
+
+START_DATE = "2025-01-01"
+
+# Rows written per INSERT by the generator
+INSERT_CHUNK_SIZE = 10_000
+
+# Times of the generated and benchmarked rows
+SHIFT = {"checkin": "08:00:00", "checkout": "17:00:00", "break_hours": 1}
+
+
+def run(company, sizes=None, employees=200, rows_per_sheet=50, repeat=3, output=None, keep=False):
+	"""Generate each data set size in turn, time it and write the results to `output` (JSON)"""
+	sizes = [int(size) for size in sizes or SIZES]
+	results = {
+		"app_version": cmecustom.__version__,
+		"frappe_version": frappe.__version__,
+		"database": frappe.db.sql("SELECT VERSION()")[0][0],
+		"timestamp": now(),
+		"config": {"employees": employees, "rows_per_sheet": rows_per_sheet, "repeat": repeat},
+		"results": [],
+	}
+
+	for size in sizes:
+		clear_data()
+		last_date = generate_data(company, size, employees, rows_per_sheet)
+		frappe.db.commit()
+
+		results["results"].append(
+			{
+				"detail_rows": size,
+				"stages": benchmark(company, employees, rows_per_sheet, last_date, repeat),
+			}
+		)
+
+	if not keep:
+		clear_data()
+		frappe.db.commit()
+
+	output = output or frappe.get_site_path("private", "files", f"timesheet_benchmark_{nowdate()}.json")
+	with open(output, "w") as f:
+		json.dump(results, f, indent=1)
+
+	print(f"Benchmark results written to {output}")
+	return results
+
+
+def generate_data(company, detail_rows, employees, rows_per_sheet):
+	"""Insert submitted sheets totalling `detail_rows` rows and return the last date used.
+
+	Every employee appears once per date, so a date holds `employees / rows_per_sheet` sheets.
+	"""
+	employee_names = make_employees(company, employees)
+	projects = frappe.get_all("Project", filters={"company": company}, pluck="name") or [None]
+
+	sheets_per_day = max(employees // rows_per_sheet, 1)
+	sheet_count = math.ceil(detail_rows / rows_per_sheet)
+	hours = calculate_row_hours([frappe._dict(SHIFT)])[0]
+	timestamp = now()
+	user = frappe.session.user
+
+	sheets, details, intervals = [], [], []
+	for sheet_idx in range(sheet_count):
+		date = add_days(START_DATE, sheet_idx // sheets_per_day)
+		parent = f"{DATA_PREFIX}-PT-{sheet_idx:07d}"
+		rows = []
+		for idx in range(1, rows_per_sheet + 1):
+			employee = employee_names[
+				((sheet_idx % sheets_per_day) * rows_per_sheet + idx - 1) % len(employee_names)
+			]
+			rows.append(
+				frappe._dict(
+					name=f"{parent}-{idx:03d}",
+					employee=employee,
+					project=projects[(sheet_idx + idx) % len(projects)],
+					**SHIFT,
+				)
+			)
+
+		sheets.append(
+			(
+				parent,
+				timestamp,
+				timestamp,
+				user,
+				user,
+				1,
+				date,
+				company,
+				hours.working_hours * len(rows),
+				hours.overtime * len(rows),
+			)
+		)
+		for idx, row in enumerate(rows, start=1):
+			details.append(
+				(
+					row.name,
+					timestamp,
+					timestamp,
+					user,
+					user,
+					1,
+					parent,
+					"Project Timesheet",
+					"project_timesheet_details",
+					idx,
+					row.employee,
+					row.employee,
+					row.project,
+					row.checkin,
+					row.checkout,
+					row.break_hours,
+					hours.working_hours,
+					hours.overtime,
+				)
+			)
+		intervals.extend(get_interval_values(parent, date, rows, timestamp))
+
+		if len(details) >= INSERT_CHUNK_SIZE:
+			insert_chunk(sheets, details, intervals)
+			sheets, details, intervals = [], [], []
+
+	insert_chunk(sheets, details, intervals)
+	rebuild_rollup()
+
+	return getdate(add_days(START_DATE, (sheet_count - 1) // sheets_per_day))
+
+
+def get_or_create_company(company_name=f"{DATA_PREFIX} Company"):
+	"""Company for the generated data, for test sites without one"""
+	if not frappe.db.exists("Company", company_name):
+		frappe.get_doc(
+			{
+				"doctype": "Company",
+				"company_name": company_name,
+				"abbr": DATA_PREFIX,
+				"default_currency": "USD",
+				"country": "United States",
+			}
+		).insert(ignore_permissions=True)
+
+	return company_name
+
+
+def make_employees(company, count):
+	names = [f"{DATA_PREFIX}-EMP-{i:05d}" for i in range(count)]
+	timestamp = now()
+	frappe.db.bulk_insert(
+		"Employee",
+		[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"naming_series",
+			"first_name",
+			"employee_name",
+			"company",
+			"status",
+			"gender",
+			"date_of_birth",
+			"date_of_joining",
+		],
+		[
+			(
+				name,
+				timestamp,
+				timestamp,
+				"Administrator",
+				"Administrator",
+				"HR-EMP-",
+				name,
+				name,
+				company,
+				"Active",
+				"Male",
+				"1990-01-01",
+				"2020-01-01",
+			)
+			for name in names
+		],
+		ignore_duplicates=True,
+	)
+	return names
+
+
+def insert_chunk(sheets, details, intervals):
+	frappe.db.bulk_insert(
+		"Project Timesheet",
+		[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"docstatus",
+			"date",
+			"company",
+			"total_working_hours",
+			"total_overtime",
+		],
+		sheets,
+	)
+	frappe.db.bulk_insert(
+		"Project Timesheet Details",
+		[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"docstatus",
+			"parent",
+			"parenttype",
+			"parentfield",
+			"idx",
+			"employee",
+			"employee_name",
+			"project",
+			"checkin",
+			"checkout",
+			"break_hours",
+			"working_hours",
+			"overtime",
+		],
+		details,
+	)
+	frappe.db.bulk_insert("Project Timesheet Interval", INTERVAL_FIELDS, intervals)
+
+
+def clear_data():
+	"""Remove everything a previous run generated"""
+	like = f"{DATA_PREFIX}-%"
+	frappe.db.sql("DELETE FROM `tabProject Timesheet Interval` WHERE project_timesheet LIKE %s", like)
+	frappe.db.sql("DELETE FROM `tabProject Timesheet Details` WHERE parent LIKE %s", like)
+	frappe.db.sql("DELETE FROM `tabProject Timesheet` WHERE name LIKE %s", like)
+	frappe.db.sql("DELETE FROM `tabEmployee` WHERE name LIKE %s", like)
+	rebuild_rollup()
+
+
+def benchmark(company, employees, rows_per_sheet, last_date, repeat):
+	"""Time each stage `repeat` times and return min/median/max seconds per stage"""
+	employee_names = [f"{DATA_PREFIX}-EMP-{i:05d}" for i in range(min(employees, rows_per_sheet))]
+	filters = frappe._dict(company=company, from_date=add_days(last_date, -30), to_date=last_date)
+
+	timings = {}
+	for _i in range(repeat):
+		# A new sheet on the day after the data set, checked against its overnight neighbours
+		doc = frappe.new_doc("Project Timesheet")
+		doc.date = add_days(last_date, 1)
+		doc.company = company
+		for employee in employee_names:
+			doc.append("project_timesheet_details", {"employee": employee, **SHIFT})
+
+		measure(timings, "validate", lambda: doc.run_method("validate"))
+		doc.insert()
+		measure(timings, "submit", doc.submit)
+		measure(timings, "cancel", doc.cancel)
+
+		# Leave the data set as generated for the next repetition
+		frappe.db.rollback()
+		frappe.local.message_log = []
+
+		for stage, method in get_report_benchmarks(filters).items():
+			measure(timings, stage, method)
+
+	return {
+		stage: {
+			"min": min(values),
+			"median": statistics.median(values),
+			"max": max(values),
+		}
+		for stage, values in timings.items()
+	}
+
+
+def get_report_benchmarks(filters):
+	"""Uncached report builders, keyed by stage name"""
+	from cmecustom.cmecustom.report.project_timesheet_detail import project_timesheet_detail
+	from cmecustom.cmecustom.report.project_timesheet_monthly import project_timesheet_monthly
+	from cmecustom.cmecustom.report.project_timesheet_summary import project_timesheet_summary
+
+	first_day, last_day = getdate(filters.from_date), getdate(filters.to_date)
+	return {
+		"report:detail": lambda: project_timesheet_detail.get_data(filters),
+		"report:summary": lambda: project_timesheet_summary.get_report(filters),
+		"report:monthly": lambda: project_timesheet_monthly.get_report(
+			first_day, last_day, None, filters.company
+		),
+	}
+
+
+def measure(timings, stage, method):
+	start = time.perf_counter()
+	method()
+	timings.setdefault(stage, []).append(round(time.perf_counter() - start, 6))
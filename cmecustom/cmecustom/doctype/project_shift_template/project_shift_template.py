@@ -0,0 +1,19 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ProjectShiftTemplate(Document):
+	"""Check-in/check-out times used to prefill Project Timesheet rows fetched in bulk"""
+
+	def validate(self):
+		if self.is_default:
+			# Only one default template
+			frappe.db.set_value(
+				"Project Shift Template",
+				{"is_default": 1, "name": ("!=", self.name)},
+				"is_default",
+				0,
+			)
@@ -9,6 +9,27 @@ frappe.ui.form.on("Project Timesheet", {
 				frm.trigger("fetch_employees");
 			});
 		}
+
+		// Amend without recreating the ERPNext Timesheets of unchanged rows
+		if (frm.doc.docstatus === 1 && frm.perm[0].cancel && frm.perm[0].amend) {
+			frm.add_custom_button(__("Cancel and Amend"), function () {
+				frappe.confirm(__("Cancel this Project Timesheet and create an amendment?"), () => {
+					frm.call("cancel_and_amend").then((r) => {
+						frappe.set_route("Form", frm.doctype, r.message);
+					});
+				});
+			});
+		}
+
+		// Resume a background Timesheet creation/cancellation that stopped part way
+		let job_stopped =
+			frm.doc.timesheet_creation_status === "Failed" ||
+			(frm.doc.__onload && frm.doc.__onload.timesheet_job_stale);
+		if (frm.doc.docstatus > 0 && job_stopped) {
+			frm.add_custom_button(__("Retry Timesheet Job"), function () {
+				frm.call("retry_employee_timesheets").then(() => frm.reload_doc());
+			});
+		}
 	},
 
 	fetch_employees(frm) {
@@ -28,37 +49,30 @@ frappe.ui.form.on("Project Timesheet", {
 					label: __("Designation"),
 					options: "Designation",
 				},
+				{
+					fieldname: "shift_template",
+					fieldtype: "Link",
+					label: __("Shift Template"),
+					options: "Project Shift Template",
+					description: __("Defaults to the default template, or 08:00 - 17:00 with a 1 hour break"),
+				},
 			],
 			primary_action_label: __("Fetch"),
 			primary_action: function (values) {
+				// Rows come back complete (shift times and hours), minus employees already in the table
 				frappe.call({
-					method: "frappe.client.get_list",
+					method: "cmecustom.cmecustom.doctype.project_timesheet.project_timesheet.get_employee_rows",
 					args: {
-						doctype: "Employee",
-						filters: {
-							status: "Active",
-							...(values.department && { department: values.department }),
-							...(values.designation && { designation: values.designation }),
-						},
-						fields: ["name", "employee_name", "designation"],
-						limit_page_length: 0,
+						...values,
+						existing: (frm.doc.project_timesheet_details || [])
+							.map((row) => row.employee)
+							.filter(Boolean),
 					},
+					freeze: true,
 					callback: function (r) {
-						if (r.message) {
-							r.message.forEach((emp) => {
-								// Check if employee already exists in table
-								let exists = frm.doc.project_timesheet_details.some(
-									(row) => row.employee === emp.name
-								);
-								if (!exists) {
-									let row = frm.add_child("project_timesheet_details");
-									row.employee = emp.name;
-									row.employee_name = emp.employee_name;
-									row.designation = emp.designation;
-									row.checkin = "08:00:00";
-									row.checkout = "17:00:00";
-									row.break_hours = 1;
-								}
+						if (r.message && r.message.length) {
+							r.message.forEach((row) => {
+								frm.add_child("project_timesheet_details", row);
 							});
 							frm.refresh_field("project_timesheet_details");
 							frm.trigger("calculate_totals");
@@ -87,23 +101,23 @@ frappe.ui.form.on("Project Timesheet", {
 
 frappe.ui.form.on("Project Timesheet Details", {
 	checkin(frm, cdt, cdn) {
-		calculate_row_hours(frm, cdt, cdn);
+		queue_row_hours(frm, cdn);
 	},
 
 	checkout(frm, cdt, cdn) {
-		calculate_row_hours(frm, cdt, cdn);
+		queue_row_hours(frm, cdn);
 	},
 
 	checkin_2(frm, cdt, cdn) {
-		calculate_row_hours(frm, cdt, cdn);
+		queue_row_hours(frm, cdn);
 	},
 
 	checkout_2(frm, cdt, cdn) {
-		calculate_row_hours(frm, cdt, cdn);
+		queue_row_hours(frm, cdn);
 	},
 
 	break_hours(frm, cdt, cdn) {
-		calculate_row_hours(frm, cdt, cdn);
+		queue_row_hours(frm, cdn);
 	},
 
 	project_timesheet_details_remove(frm) {
@@ -111,57 +125,91 @@ frappe.ui.form.on("Project Timesheet Details", {
 	},
 });
 
-function calculate_row_hours(frm, cdt, cdn) {
-	let row = locals[cdt][cdn];
-	let total_hours = 0;
-	const standard_hours = 8;
+// Same rules as cmecustom/cmecustom/timesheet_hours.py - keep both in sync
+const STANDARD_HOURS = 8;
+const MINUTES_PER_DAY = 1440;
 
-	// Calculate first shift
-	if (row.checkin && row.checkout) {
-		let shift1 = time_diff_in_hours(row.checkout, row.checkin);
-		if (shift1 > 0) total_hours += shift1;
-	}
+function queue_row_hours(frm, cdn) {
+	// Edits (e.g. a column pasted into the grid) are collected and recalculated once per frame
+	frm._dirty_rows = frm._dirty_rows || new Set();
+	frm._dirty_rows.add(cdn);
 
-	// Calculate second shift
-	if (row.checkin_2 && row.checkout_2) {
-		let checkin2 = row.checkin_2;
-		let checkout2 = row.checkout_2;
-		// Only calculate if not 00:00:00
-		if (checkin2 !== "00:00:00" && checkout2 !== "00:00:00") {
-			let shift2 = time_diff_in_hours(checkout2, checkin2);
-			if (shift2 > 0) total_hours += shift2;
-		}
+	if (!frm._row_hours_frame) {
+		frm._row_hours_frame = requestAnimationFrame(() => calculate_dirty_rows(frm));
 	}
+}
 
-	// Deduct break hours
-	let break_hours = flt(row.break_hours) || 0;
-	let net_hours = total_hours - break_hours;
-	if (net_hours < 0) net_hours = 0;
-
-	// Set working hours and overtime
-	frappe.model.set_value(cdt, cdn, "working_hours", flt(net_hours, 2));
+function calculate_dirty_rows(frm) {
+	let cdt = "Project Timesheet Details";
+	let dirty_rows = frm._dirty_rows;
+	frm._dirty_rows = new Set();
+	frm._row_hours_frame = null;
+
+	let working_delta = 0;
+	let overtime_delta = 0;
+
+	dirty_rows.forEach((cdn) => {
+		let row = locals[cdt][cdn];
+		if (!row) return; // removed before the frame ran
+
+		// Set working hours and overtime without a trigger and grid render per field
+		let hours = get_row_hours(row);
+		working_delta += hours.working_hours - flt(row.working_hours);
+		overtime_delta += hours.overtime - flt(row.overtime);
+		row.working_hours = hours.working_hours;
+		row.overtime = hours.overtime;
+	});
+
+	frm.dirty();
+	frm.refresh_field("project_timesheet_details");
+	update_totals(frm, working_delta, overtime_delta);
+}
 
-	if (net_hours > standard_hours) {
-		frappe.model.set_value(cdt, cdn, "overtime", flt(net_hours - standard_hours, 2));
-	} else {
-		frappe.model.set_value(cdt, cdn, "overtime", 0);
+function update_totals(frm, working_delta, overtime_delta) {
+	// Totals are kept in step with the rows, so only the change needs to be applied
+	if (working_delta) {
+		frm.set_value("total_working_hours", flt(flt(frm.doc.total_working_hours) + working_delta, 2));
+	}
+	if (overtime_delta) {
+		frm.set_value("total_overtime", flt(flt(frm.doc.total_overtime) + overtime_delta, 2));
 	}
-
-	frm.trigger("calculate_totals");
 }
 
-function time_diff_in_hours(end_time, start_time) {
-	// Parse time strings (HH:MM:SS or HH:MM)
-	let start = moment(start_time, "HH:mm:ss");
-	let end = moment(end_time, "HH:mm:ss");
+function get_row_hours(row) {
+	let shift_minutes = 0;
 
-	let diff = moment.duration(end.diff(start));
-	let hours = diff.asHours();
+	// First shift
+	let checkin = time_to_minutes(row.checkin);
+	let checkout = time_to_minutes(row.checkout);
+	if (checkin !== null && checkout !== null) {
+		shift_minutes += shift_length(checkin, checkout);
+	}
 
-	// Handle overnight shift (end time is earlier than start time)
-	if (hours <= 0) {
-		hours += 24;
+	// Second shift, unless it is left at 00:00 - 00:00
+	let checkin_2 = time_to_minutes(row.checkin_2);
+	let checkout_2 = time_to_minutes(row.checkout_2);
+	if (checkin_2 !== null && checkout_2 !== null && (checkin_2 || checkout_2)) {
+		shift_minutes += shift_length(checkin_2, checkout_2);
 	}
 
-	return hours;
+	// Deduct break hours
+	let net_hours = Math.max(shift_minutes / 60 - flt(row.break_hours), 0);
+
+	return {
+		working_hours: flt(net_hours, 2),
+		overtime: net_hours > STANDARD_HOURS ? flt(net_hours - STANDARD_HOURS, 2) : 0,
+	};
+}
+
+function time_to_minutes(value) {
+	// Minutes from midnight of "HH:mm[:ss]", seconds ignored
+	if (!value) return null;
+	let [hours, minutes] = value.split(":");
+	return cint(hours) * 60 + cint(minutes);
+}
+
+function shift_length(start, end) {
+	// Handle overnight shift (end time is not after start time)
+	if (end <= start) end += MINUTES_PER_DAY;
+	return end - start;
 }
@@ -1,34 +1,234 @@
 # Copyright (c) 2026, CME and contributors
 # For license information, please see license.txt
 
+from collections import Counter
+
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import flt, get_time, time_diff_in_hours
+from frappe.utils import flt, get_datetime, get_time, getdate
+from frappe.utils.background_jobs import get_job
+
+from cmecustom.cmecustom.doctype.project_timesheet_interval.project_timesheet_interval import (
+	delete_intervals,
+	get_overlapping_intervals,
+	insert_intervals,
+)
+from cmecustom.cmecustom.doctype.project_timesheet_rollup.project_timesheet_rollup import update_rollup
+from cmecustom.cmecustom.instrumentation import instrument
+from cmecustom.cmecustom.report_cache import invalidate_report_cache
+from cmecustom.cmecustom.timesheet_hours import (
+	STANDARD_HOURS,
+	ShiftInterval,
+	calculate_row_hours,
+	find_overlapping_intervals,
+	get_shift_datetimes,
+	get_shift_intervals,
+	time_to_minutes,
+)
+
+# Sheets with more rows than this create/cancel their ERPNext Timesheets in a background job
+BACKGROUND_SUBMIT_THRESHOLD = 100
+
+# Rows processed (and committed) per step of the background job
+TIMESHEET_CHUNK_SIZE = 50
+
+# Row fields that decide whether an amended row can keep its ERPNext Timesheet
+ROW_SIGNATURE_FIELDS = (
+	"employee",
+	"external_worker_name",
+	"project",
+	"checkin",
+	"checkout",
+	"checkin_2",
+	"checkout_2",
+	"break_hours",
+	"working_hours",
+	"overtime",
+)
 
 
 class ProjectTimesheet(Document):
+	@instrument("project_timesheet.validate")
 	def validate(self):
+		# Each row's times are parsed once; the overlap checks and the hours share the intervals
+		shift_intervals = self.get_row_shift_intervals()
+
 		self.validate_employee_or_external()
-		self.validate_duplicate_employee()
-		self.calculate_hours()
+		self.validate_duplicate_employee(shift_intervals)
+		self.calculate_hours(shift_intervals)
 		self.calculate_totals()
 
+	def get_row_shift_intervals(self):
+		"""`get_shift_intervals` of every row, in row order"""
+		return [get_shift_intervals(row) for row in self.project_timesheet_details]
+
+	@instrument("project_timesheet.before_submit")
 	def before_submit(self):
+		self.validate_amended_timesheet_job()
+
 		# Clear old timesheet links (important for amended documents)
+		linked_status = self.get_linked_timesheet_status()
+		retained = self.get_amendment_timesheets()
+		retained_rows = {}
+
 		for row in self.project_timesheet_details:
-			if row.timesheet:
-				# Check if the linked timesheet is cancelled
-				ts_status = frappe.db.get_value("Timesheet", row.timesheet, "docstatus")
-				if ts_status == 2:  # Cancelled
+			if not row.timesheet:
+				continue
+
+			if row.timesheet in retained and linked_status.get(row.timesheet) == 1:
+				retained_rows.setdefault(row.timesheet, []).append(row)
+			else:
+				# Not handed over by `cancel_and_amend`, or cancelled (or deleted) since
+				row.timesheet = None
+
+		# Timesheet kept from the amended document: reuse it only if all of its rows are unchanged
+		reused = set()
+		for timesheet, rows in retained_rows.items():
+			if (
+				Counter(get_row_signature(row, self.date, self.company) for row in rows)
+				== retained[timesheet]
+			):
+				reused.add(timesheet)
+			else:
+				for row in rows:
 					row.timesheet = None
 
+		# Timesheets of changed or removed rows are cancelled; new ones are created on submit
+		cancel_submitted_timesheets(set(retained) - reused)
+
+	def get_linked_timesheet_status(self):
+		"""Docstatus of every linked ERPNext Timesheet, read with one query"""
+		names = list({row.timesheet for row in self.project_timesheet_details if row.timesheet})
+		if not names:
+			return {}
+
+		return dict(
+			frappe.get_all(
+				"Timesheet",
+				filters={"name": ("in", names)},
+				fields=["name", "docstatus"],
+				as_list=True,
+			)
+		)
+
+	def validate_amended_timesheet_job(self):
+		"""The amended document's Timesheets may still be cancelled by its background job"""
+		if not self.amended_from:
+			return
+
+		original = frappe.get_doc("Project Timesheet", self.amended_from)
+		if original.timesheet_creation_status in ("Queued", "In Progress") and not (
+			original.has_stale_timesheet_job()
+		):
+			frappe.throw(
+				_(
+					"The Employee Timesheets of {0} are still being cancelled in the background. Please try again later."
+				).format(self.amended_from)
+			)
+
+	def get_amendment_timesheets(self):
+		"""Map each Timesheet still linked from `amended_from` to the signatures of its rows
+		(a consolidated Timesheet covers several rows).
+
+		Only a document cancelled through `cancel_and_amend` hands its Timesheets over;
+		after a standard cancel they are (being) cancelled with it.
+		"""
+		if not self.amended_from:
+			return {}
+
+		original = frappe.db.get_value(
+			"Project Timesheet",
+			self.amended_from,
+			["date", "company", "timesheets_retained"],
+			as_dict=True,
+		)
+		if not original.timesheets_retained:
+			return {}
+
+		rows = frappe.get_all(
+			"Project Timesheet Details",
+			filters={
+				"parent": self.amended_from,
+				"parenttype": "Project Timesheet",
+				"timesheet": ("is", "set"),
+			},
+			fields=["timesheet", *ROW_SIGNATURE_FIELDS],
+		)
+		signatures = {}
+		for row in rows:
+			signatures.setdefault(row.timesheet, Counter())[
+				get_row_signature(row, original.date, original.company)
+			] += 1
+
+		return signatures
+
+	@frappe.whitelist()
+	def cancel_and_amend(self):
+		"""Cancel this document and create its amendment, keeping the ERPNext Timesheets.
+
+		The linked Timesheets stay submitted until the amendment is submitted;
+		only the ones whose rows changed are cancelled and recreated then.
+		"""
+		self.check_permission("cancel")
+		self.check_permission("amend")
+
+		self.flags.retain_timesheets = True
+		self.cancel()
+
+		# Rows keep their `timesheet` links in the copy
+		amended = frappe.copy_doc(self)
+		amended.docstatus = 0
+		amended.amended_from = self.name
+		amended.insert()
+
+		return amended.name
+
+	@instrument("project_timesheet.on_submit")
 	def on_submit(self):
-		self.create_employee_timesheets()
+		update_rollup(self, 1)
+		insert_intervals(self)
+
+		if self.run_in_background():
+			self.enqueue_timesheet_job(create_employee_timesheets_in_background)
+		else:
+			self.create_employee_timesheets()
+
+	def onload(self):
+		if self.has_stale_timesheet_job():
+			self.set_onload("timesheet_job_stale", 1)
+
+	def before_cancel(self):
+		if self.timesheet_creation_status in ("Queued", "In Progress") and not self.has_stale_timesheet_job():
+			frappe.throw(
+				_("Employee Timesheets are still being created in the background. Please try again later.")
+			)
 
+	@instrument("project_timesheet.on_cancel")
 	def on_cancel(self):
-		self.cancel_employee_timesheets()
+		update_rollup(self, -1)
+		delete_intervals(self)
+
+		if self.flags.retain_timesheets:
+			# Timesheets are handed over to the amendment (see `cancel_and_amend`)
+			self.db_set("timesheets_retained", 1, update_modified=False)
+			return
+
+		if self.run_in_background():
+			self.enqueue_timesheet_job(cancel_employee_timesheets_in_background)
+		else:
+			self.cancel_employee_timesheets()
 
+	def on_trash(self):
+		# Timesheets kept for a discarded amendment are cancelled with it
+		if self.amended_from and self.docstatus == 0:
+			cancel_submitted_timesheets(set(self.get_amendment_timesheets()))
+
+	def run_in_background(self):
+		"""Large sheets create and cancel their ERPNext Timesheets in a background job"""
+		return len(self.project_timesheet_details) > BACKGROUND_SUBMIT_THRESHOLD and not frappe.flags.in_test
+
+	@instrument("project_timesheet.validate_employee_or_external")
 	def validate_employee_or_external(self):
 		"""Either employee or external_worker_name must be filled"""
 		for row in self.project_timesheet_details:
@@ -43,47 +243,57 @@ class ProjectTimesheet(Document):
 					)
 				)
 
-	def validate_duplicate_employee(self):
+	def validate_duplicate_employee(self, shift_intervals=None):
 		"""Check for overlapping times for same employee within the document"""
+		if shift_intervals is None:
+			shift_intervals = self.get_row_shift_intervals()
+
 		# Check for overlapping times within the same document
-		self.check_internal_time_overlaps()
+		self.check_internal_time_overlaps(shift_intervals)
 
 		# Check for overlapping times across different Project Timesheets
-		self.check_time_overlaps()
+		# (bulk imports check a whole batch at once and set this flag)
+		if not self.flags.ignore_overlap_warnings:
+			self.check_time_overlaps(shift_intervals)
 
-	def check_internal_time_overlaps(self):
+	@instrument("project_timesheet.check_internal_time_overlaps")
+	def check_internal_time_overlaps(self, shift_intervals=None):
 		"""Check for overlapping times for the same employee within this document"""
-		rows_by_employee = {}
+		if shift_intervals is None:
+			shift_intervals = self.get_row_shift_intervals()
 
-		# Group rows by employee
-		for row in self.project_timesheet_details:
+		intervals_by_employee = {}
+
+		# Group first and second shift intervals by employee
+		for row, intervals in zip(self.project_timesheet_details, shift_intervals, strict=True):
 			if row.employee:
-				if row.employee not in rows_by_employee:
-					rows_by_employee[row.employee] = []
-				rows_by_employee[row.employee].append(row)
+				for interval in intervals:
+					intervals_by_employee.setdefault(row.employee, []).append((row, interval))
 
 		# Check for overlaps within each employee's entries
 		overlap_errors = []
-		for _employee, rows in rows_by_employee.items():
-			if len(rows) < 2:
+		for intervals in intervals_by_employee.values():
+			if len(intervals) < 2:
 				continue
 
-			for i, row1 in enumerate(rows):
-				for row2 in rows[i + 1 :]:
-					# Check first shift overlap
-					if row1.checkin and row1.checkout and row2.checkin and row2.checkout:
-						if self.times_overlap(row1.checkin, row1.checkout, row2.checkin, row2.checkout):
-							overlap_errors.append(
-								{
-									"employee": row1.employee_name or row1.employee,
-									"row1_idx": row1.idx,
-									"row1_time": f"{row1.checkin} - {row1.checkout}",
-									"row1_project": row1.project or "No Project",
-									"row2_idx": row2.idx,
-									"row2_time": f"{row2.checkin} - {row2.checkout}",
-									"row2_project": row2.project or "No Project",
-								}
-							)
+			for (row1, interval1), (row2, interval2) in find_overlapping_intervals(
+				intervals, key=lambda item: item[1]
+			):
+				if row2.idx < row1.idx:
+					row1, interval1, row2, interval2 = row2, interval2, row1, interval1
+				overlap_errors.append(
+					{
+						"employee": row1.employee_name or row1.employee,
+						"row1_idx": row1.idx,
+						"row1_time": f"{interval1.checkin} - {interval1.checkout}",
+						"row1_project": row1.project or "No Project",
+						"row2_idx": row2.idx,
+						"row2_time": f"{interval2.checkin} - {interval2.checkout}",
+						"row2_project": row2.project or "No Project",
+					}
+				)
+
+		overlap_errors.sort(key=lambda e: (e["row1_idx"], e["row2_idx"]))
 
 		if overlap_errors:
 			error_msg = _("<b>Error: Overlapping times for same employee!</b><br><br>")
@@ -104,95 +314,10 @@ class ProjectTimesheet(Document):
 				)
 			frappe.throw(error_msg, title=_("Time Overlap Error"))
 
-	def check_time_overlaps(self):
+	@instrument("project_timesheet.check_time_overlaps")
+	def check_time_overlaps(self, shift_intervals=None):
 		"""Warn if employee has overlapping time entries on the same date"""
-		overlap_warnings = []
-
-		for row in self.project_timesheet_details:
-			if not row.employee or not row.checkin or not row.checkout:
-				continue
-
-			# Get other timesheet entries for this employee on the same date
-			existing_entries = frappe.db.sql(
-				"""
-				SELECT
-					pt.name as timesheet_name,
-					ptd.checkin,
-					ptd.checkout,
-					ptd.checkin_2,
-					ptd.checkout_2,
-					ptd.project
-				FROM `tabProject Timesheet` pt
-				INNER JOIN `tabProject Timesheet Details` ptd ON ptd.parent = pt.name
-				WHERE pt.date = %s
-				AND pt.docstatus = 1
-				AND pt.name != %s
-				AND ptd.employee = %s
-			""",
-				(self.date, self.name, row.employee),
-				as_dict=True,
-			)
-
-			for entry in existing_entries:
-				# Check overlap for first shift
-				if self.times_overlap(row.checkin, row.checkout, entry.checkin, entry.checkout):
-					overlap_warnings.append(
-						{
-							"employee": row.employee_name or row.employee,
-							"row_idx": row.idx,
-							"current_time": f"{row.checkin} - {row.checkout}",
-							"current_project": row.project or "No Project",
-							"existing_timesheet": entry.timesheet_name,
-							"existing_time": f"{entry.checkin} - {entry.checkout}",
-							"existing_project": entry.project or "No Project",
-						}
-					)
-
-				# Check overlap with second shift of existing entry
-				if entry.checkin_2 and entry.checkout_2:
-					checkin_2 = get_time(entry.checkin_2)
-					checkout_2 = get_time(entry.checkout_2)
-					if not (
-						checkin_2.hour == 0
-						and checkin_2.minute == 0
-						and checkout_2.hour == 0
-						and checkout_2.minute == 0
-					):
-						if self.times_overlap(row.checkin, row.checkout, entry.checkin_2, entry.checkout_2):
-							overlap_warnings.append(
-								{
-									"employee": row.employee_name or row.employee,
-									"row_idx": row.idx,
-									"current_time": f"{row.checkin} - {row.checkout}",
-									"current_project": row.project or "No Project",
-									"existing_timesheet": entry.timesheet_name,
-									"existing_time": f"{entry.checkin_2} - {entry.checkout_2}",
-									"existing_project": entry.project or "No Project",
-								}
-							)
-
-				# Check current second shift overlap if exists
-				if row.checkin_2 and row.checkout_2:
-					checkin_2 = get_time(row.checkin_2)
-					checkout_2 = get_time(row.checkout_2)
-					if not (
-						checkin_2.hour == 0
-						and checkin_2.minute == 0
-						and checkout_2.hour == 0
-						and checkout_2.minute == 0
-					):
-						if self.times_overlap(row.checkin_2, row.checkout_2, entry.checkin, entry.checkout):
-							overlap_warnings.append(
-								{
-									"employee": row.employee_name or row.employee,
-									"row_idx": row.idx,
-									"current_time": f"{row.checkin_2} - {row.checkout_2}",
-									"current_project": row.project or "No Project",
-									"existing_timesheet": entry.timesheet_name,
-									"existing_time": f"{entry.checkin} - {entry.checkout}",
-									"existing_project": entry.project or "No Project",
-								}
-							)
+		overlap_warnings = self.get_overlap_warnings(shift_intervals=shift_intervals)
 
 		# Show warning message if overlaps found
 		if overlap_warnings:
@@ -213,183 +338,499 @@ class ProjectTimesheet(Document):
 				)
 			frappe.msgprint(warning_msg, title=_("Time Overlap Warning"), indicator="orange")
 
-	def times_overlap(self, start1, end1, start2, end2):
-		"""Check if two time periods overlap"""
-		start1 = get_time(start1)
-		end1 = get_time(end1)
-		start2 = get_time(start2)
-		end2 = get_time(end2)
-
-		# Two periods overlap if one starts before the other ends
-		return start1 < end2 and start2 < end1
-
-	def calculate_shift_hours(self, checkin, checkout):
-		"""Calculate hours for a shift, handling overnight shifts"""
-		if not checkin or not checkout:
-			return 0
-
-		checkin_time = get_time(checkin)
-		checkout_time = get_time(checkout)
-
-		# Convert to minutes for easier calculation
-		checkin_minutes = checkin_time.hour * 60 + checkin_time.minute
-		checkout_minutes = checkout_time.hour * 60 + checkout_time.minute
+	def get_overlap_warnings(self, existing_entries=None, shift_intervals=None):
+		"""Overlaps between this document's shifts and the stored shifts of submitted timesheets.
+
+		Shifts are compared as absolute datetimes, so an overnight shift is also checked
+		against the next day's sheets. `existing_entries` may be preloaded with
+		`get_overlapping_intervals` when checking many documents, and `shift_intervals`
+		with `get_row_shift_intervals`.
+		"""
+		employees = {row.employee for row in self.project_timesheet_details if row.employee}
+		if not employees:
+			return []
+
+		if shift_intervals is None:
+			shift_intervals = self.get_row_shift_intervals()
+
+		# Build one interval list per employee, in minutes from midnight of this date
+		date = getdate(self.date)
+		intervals_by_employee = {}
+		for row, intervals in zip(self.project_timesheet_details, shift_intervals, strict=True):
+			if not row.employee:
+				continue
+			for interval in intervals:
+				intervals_by_employee.setdefault(row.employee, []).append(("current", row, interval))
+
+		if not intervals_by_employee:
+			return []
+
+		if existing_entries is None:
+			# Shifts of this document lie within its date and the following morning
+			all_intervals = [item[2] for items in intervals_by_employee.values() for item in items]
+			from_time = get_shift_datetimes(date, min(all_intervals, key=lambda i: i.start))[0]
+			to_time = get_shift_datetimes(date, max(all_intervals, key=lambda i: i.end))[1]
+			existing_entries = get_overlapping_intervals(employees, from_time, to_time, exclude=self.name)
+
+		midnight = get_datetime(date)
+		for entry in existing_entries:
+			if entry.employee not in intervals_by_employee:
+				continue
+			start = int((get_datetime(entry.from_time) - midnight).total_seconds() // 60)
+			end = int((get_datetime(entry.to_time) - midnight).total_seconds() // 60)
+			interval = ShiftInterval(
+				start, end, format_shift_time(entry.from_time, date), format_shift_time(entry.to_time, date)
+			)
+			intervals_by_employee[entry.employee].append(("existing", entry, interval))
 
-		# If checkout is earlier than checkin, it's an overnight shift
-		if checkout_minutes <= checkin_minutes:
-			# Add 24 hours (1440 minutes) to checkout
-			checkout_minutes += 1440
+		overlap_warnings = []
+		for intervals in intervals_by_employee.values():
+			for first, second in find_overlapping_intervals(intervals, key=lambda item: item[2]):
+				if first[0] == second[0]:
+					continue
+				current, existing = (first, second) if first[0] == "current" else (second, first)
+				row, row_interval = current[1], current[2]
+				entry, entry_interval = existing[1], existing[2]
+				overlap_warnings.append(
+					{
+						"employee": row.employee_name or row.employee,
+						"row_idx": row.idx,
+						"current_time": f"{row_interval.checkin} - {row_interval.checkout}",
+						"current_project": row.project or "No Project",
+						"existing_timesheet": entry.timesheet_name,
+						"existing_time": f"{entry_interval.checkin} - {entry_interval.checkout}",
+						"existing_project": entry.project or "No Project",
+					}
+				)
 
-		diff_minutes = checkout_minutes - checkin_minutes
-		return diff_minutes / 60  # Return hours
+		overlap_warnings.sort(key=lambda w: w["row_idx"])
+		return overlap_warnings
 
-	def calculate_hours(self):
+	@instrument("project_timesheet.calculate_hours")
+	def calculate_hours(self, shift_intervals=None):
 		"""Calculate working hours and overtime for each row"""
-		standard_hours = 8  # Standard working hours per day
-
-		for row in self.project_timesheet_details:
-			total_hours = 0
-
-			# Calculate first shift hours
-			if row.checkin and row.checkout:
-				shift1_hours = self.calculate_shift_hours(row.checkin, row.checkout)
-				if shift1_hours > 0:
-					total_hours += shift1_hours
-
-			# Calculate second shift hours (if exists)
-			if row.checkin_2 and row.checkout_2:
-				checkin_2 = get_time(row.checkin_2)
-				checkout_2 = get_time(row.checkout_2)
-				# Only calculate if times are not 00:00:00
-				if not (
-					checkin_2.hour == 0
-					and checkin_2.minute == 0
-					and checkout_2.hour == 0
-					and checkout_2.minute == 0
-				):
-					shift2_hours = self.calculate_shift_hours(row.checkin_2, row.checkout_2)
-					if shift2_hours > 0:
-						total_hours += shift2_hours
-
-			# Deduct break hours
-			break_hours = flt(row.break_hours) or 0
-			net_hours = total_hours - break_hours
-
-			if net_hours < 0:
-				net_hours = 0
-
-			# Calculate working hours and overtime
-			if net_hours <= standard_hours:
-				row.working_hours = flt(net_hours, 2)
-				row.overtime = 0
-			else:
-				row.working_hours = flt(net_hours, 2)
-				row.overtime = flt(net_hours - standard_hours, 2)
-
+		for row, hours in zip(
+			self.project_timesheet_details,
+			calculate_row_hours(self.project_timesheet_details, shift_intervals),
+			strict=True,
+		):
+			row.working_hours = hours.working_hours
+			row.overtime = hours.overtime
+
+	@instrument("project_timesheet.calculate_totals")
 	def calculate_totals(self):
 		"""Calculate total working hours and overtime"""
 		self.total_working_hours = sum(flt(row.working_hours) for row in self.project_timesheet_details)
 		self.total_overtime = sum(flt(row.overtime) for row in self.project_timesheet_details)
 
+	@instrument("project_timesheet.create_employee_timesheets")
 	def create_employee_timesheets(self):
 		"""Create ERPNext Timesheet for each employee on submit"""
-		from datetime import timedelta
+		self.create_timesheets_for_rows(self.get_pending_timesheet_rows())
 
-		for row in self.project_timesheet_details:
-			if row.working_hours <= 0:
-				continue
+		frappe.msgprint(_("Employee Timesheets created successfully"), indicator="green")
 
-			# Determine employee for timesheet
-			is_external = False
-			if row.employee:
-				employee = row.employee
-				worker_name = row.employee_name
-			elif row.external_worker_name:
-				# Use "External" employee for external workers
-				external_emp = frappe.db.get_value("Employee", {"employee_name": "External"}, "name")
-				if not external_emp:
-					frappe.throw(
-						_(
-							"Employee 'External' not found. Please create an Employee with name 'External' for external worker timesheets."
-						)
+	def enqueue_timesheet_job(self, job):
+		"""Run `job` (creation or cancellation of the ERPNext Timesheets) in the background"""
+		self.db_set("timesheet_creation_status", "Queued")
+		frappe.enqueue(
+			job,
+			queue="long",
+			timeout=3600,
+			job_id=self.get_timesheet_job_id(),
+			deduplicate=True,
+			enqueue_after_commit=True,
+			docname=self.name,
+		)
+		frappe.msgprint(
+			_("Employee Timesheets will be updated in the background. You can track the progress here."),
+			indicator="blue",
+			alert=True,
+		)
+
+	@frappe.whitelist()
+	def retry_employee_timesheets(self):
+		"""Resume a failed (or lost) background job from the first row it has not processed"""
+		if self.timesheet_creation_status != "Failed" and not self.has_stale_timesheet_job():
+			frappe.throw(_("Only documents with a failed Timesheet job can be retried"))
+
+		if self.docstatus == 1:
+			self.check_permission("submit")
+			self.enqueue_timesheet_job(create_employee_timesheets_in_background)
+		elif self.docstatus == 2:
+			self.check_permission("cancel")
+			self.enqueue_timesheet_job(cancel_employee_timesheets_in_background)
+
+	def get_timesheet_job_id(self):
+		return f"project_timesheet::{self.name}"
+
+	def has_stale_timesheet_job(self):
+		"""The status says a job is queued or running, but RQ no longer has it (e.g. its worker was killed)"""
+		if self.timesheet_creation_status not in ("Queued", "In Progress"):
+			return False
+
+		job = get_job(self.get_timesheet_job_id())
+		return not job or job.get_status() in ("finished", "failed", "stopped", "canceled")
+
+	def get_pending_timesheet_rows(self):
+		"""Rows that still need an ERPNext Timesheet"""
+		return [
+			row
+			for row in self.project_timesheet_details
+			if flt(row.working_hours) > 0 and not row.timesheet and (row.employee or row.external_worker_name)
+		]
+
+	def get_timesheet_lookups(self, rows):
+		"""Resolve the records shared by every Timesheet of this submit once"""
+		lookups = frappe._dict(external_employee=None)
+
+		if any(not row.employee for row in rows):
+			# Use "External" employee for external workers
+			lookups.external_employee = frappe.db.get_value("Employee", {"employee_name": "External"}, "name")
+			if not lookups.external_employee:
+				frappe.throw(
+					_(
+						"Employee 'External' not found. Please create an Employee with name 'External' for external worker timesheets."
 					)
-				employee = external_emp
-				worker_name = row.external_worker_name
-				is_external = True
-			else:
-				continue
+				)
 
-			timesheet = frappe.new_doc("Timesheet")
-			timesheet.employee = employee
-			timesheet.company = self.company
+		self.ensure_activity_types(("Regular", "Overtime"))
+		return lookups
 
-			# Calculate from_time and to_time based on checkin/checkout
-			from_time = frappe.utils.get_datetime(f"{self.date} {row.checkin}")
-			to_time = frappe.utils.get_datetime(f"{self.date} {row.checkout}")
+	def create_timesheets_for_rows(self, rows, lookups=None):
+		"""Create Timesheets for `rows` and write their links back with one UPDATE"""
+		if not rows:
+			return
 
-			# Calculate regular hours (up to 8 hours)
-			regular_hours = min(flt(row.working_hours), 8)
-			overtime_hours = flt(row.overtime)
+		if lookups is None:
+			lookups = self.get_timesheet_lookups(rows)
 
+		groups = {}
+		for row in rows:
+			groups.setdefault(self.get_timesheet_group_key(row), []).append(row)
+
+		links = {}
+		for group in groups.values():
+			timesheet = self.create_timesheet(group, lookups)
+			links.update({row.name: timesheet for row in group})
+
+		set_timesheet_links(links)
+
+	def get_timesheet_group_key(self, row):
+		"""Rows with the same key share one ERPNext Timesheet: the worker's when consolidating, else the row's own"""
+		if self.consolidate_timesheets:
+			# External workers all book on the "External" employee
+			return row.employee or ""
+		return row.name
+
+	def create_timesheet(self, rows, lookups):
+		"""Create and submit one ERPNext Timesheet holding the time logs of `rows` (same worker)"""
+		timesheet = frappe.new_doc("Timesheet")
+		timesheet.employee = rows[0].employee or lookups.external_employee
+		timesheet.company = self.company
+
+		for row in rows:
 			# Build description with worker name
-			if is_external:
-				base_desc = f"External Worker: {worker_name} | Project Timesheet {self.name}"
+			if row.employee:
+				base_desc = f"{row.employee_name} | Project Timesheet {self.name}"
 			else:
-				base_desc = f"{worker_name} | Project Timesheet {self.name}"
-
-			# Add time log for regular hours
-			regular_end_time = from_time + timedelta(hours=regular_hours + flt(row.break_hours))
-			timesheet.append(
-				"time_logs",
-				{
-					"activity_type": self.get_activity_type("Regular"),
-					"from_time": from_time,
-					"to_time": regular_end_time,
-					"hours": regular_hours,
-					"project": row.project,
-					"description": f"Regular hours: {base_desc}",
-				},
-			)
+				base_desc = f"External Worker: {row.external_worker_name} | Project Timesheet {self.name}"
+
+			for time_log in self.get_row_time_logs(row):
+				time_log["project"] = row.project
+				time_log["description"] = f"{time_log.pop('label')}: {base_desc}"
+				timesheet.append("time_logs", time_log)
+
+		timesheet.flags.ignore_validate = True
+		timesheet.insert(ignore_permissions=True)
+		timesheet.submit()
 
-			# Add separate time log for overtime if exists
-			if overtime_hours > 0:
-				timesheet.append(
-					"time_logs",
+		# Link timesheet to the rows for reference (written back in bulk by the caller)
+		for row in rows:
+			row.timesheet = timesheet.name
+		return timesheet.name
+
+	def get_row_time_logs(self, row):
+		"""Regular and overtime logs covering each shift of a row.
+
+		Regular hours (up to the standard day) fill the shifts first, then overtime.
+		The break is taken at the start of the first regular log, so that log spans
+		its hours plus the break.
+		"""
+		from datetime import timedelta
+
+		regular_left = min(flt(row.working_hours), STANDARD_HOURS)
+		overtime_left = flt(row.overtime)
+		break_left = flt(row.break_hours)
+
+		time_logs = []
+		for interval in get_shift_intervals(row):
+			cursor, shift_end = get_shift_datetimes(getdate(self.date), interval)
+			available = (shift_end - cursor).total_seconds() / 3600
+
+			shift_break = min(break_left, available)
+			break_left -= shift_break
+			regular = min(regular_left, available - shift_break)
+			overtime = min(overtime_left, available - shift_break - regular)
+
+			for activity_type, label, hours, span in (
+				("Regular", "Regular hours", regular, regular + shift_break),
+				("Overtime", "Overtime", overtime, overtime),
+			):
+				if flt(hours, 2) <= 0:
+					continue
+				to_time = min(cursor + timedelta(hours=span), shift_end)
+				time_logs.append(
 					{
-						"activity_type": self.get_activity_type("Overtime"),
-						"from_time": regular_end_time,
+						"activity_type": activity_type,
+						"label": label,
+						"from_time": cursor,
 						"to_time": to_time,
-						"hours": overtime_hours,
-						"project": row.project,
-						"description": f"Overtime: {base_desc}",
-					},
+						"hours": flt(hours, 2),
+					}
 				)
+				cursor = to_time
 
-			timesheet.flags.ignore_validate = True
-			timesheet.insert(ignore_permissions=True)
-			timesheet.submit()
+			regular_left -= regular
+			overtime_left -= overtime
 
-			# Link timesheet to the row for reference
-			frappe.db.set_value("Project Timesheet Details", row.name, "timesheet", timesheet.name)
-
-		frappe.msgprint(_("Employee Timesheets created successfully"), indicator="green")
+		return time_logs
 
+	@instrument("project_timesheet.cancel_employee_timesheets")
 	def cancel_employee_timesheets(self):
 		"""Cancel linked ERPNext Timesheets on cancel"""
-		for row in self.project_timesheet_details:
-			# Use the stored timesheet link
-			if row.timesheet and frappe.db.exists("Timesheet", row.timesheet):
-				ts_doc = frappe.get_doc("Timesheet", row.timesheet)
-				if ts_doc.docstatus == 1:
-					ts_doc.cancel()
-					frappe.db.set_value("Project Timesheet Details", row.name, "timesheet", None)
+		self.cancel_timesheets_for_rows(self.project_timesheet_details)
 
 		frappe.msgprint(_("Linked Employee Timesheets cancelled"), indicator="orange")
 
-	def get_activity_type(self, activity_name):
-		"""Get or create activity type"""
-		if not frappe.db.exists("Activity Type", activity_name):
-			activity = frappe.new_doc("Activity Type")
-			activity.activity_type = activity_name
-			activity.insert(ignore_permissions=True)
-		return activity_name
+	def cancel_timesheets_for_rows(self, rows):
+		"""Cancel the submitted Timesheets linked to `rows` and clear their links with one UPDATE"""
+		linked_rows = [row for row in rows if row.timesheet]
+		if not linked_rows:
+			return
+
+		cancel_submitted_timesheets({row.timesheet for row in linked_rows})
+
+		# None of the linked Timesheets is submitted any more (cancelled here or before),
+		# so no row keeps a link to a cancelled sheet
+		cleared_links = {}
+		for row in linked_rows:
+			cleared_links[row.name] = None
+			row.timesheet = None
+
+		set_timesheet_links(cleared_links)
+
+	def ensure_activity_types(self, activity_names):
+		"""Create any missing activity types with a single existence query"""
+		existing = set(
+			frappe.get_all("Activity Type", filters={"name": ("in", activity_names)}, pluck="name")
+		)
+		for activity_name in activity_names:
+			if activity_name not in existing:
+				activity = frappe.new_doc("Activity Type")
+				activity.activity_type = activity_name
+				activity.insert(ignore_permissions=True)
+
+
+def format_shift_time(value, date):
+	"""Time of a stored shift boundary, with its date when it is not on `date`"""
+	value = get_datetime(value)
+	if value.date() == date:
+		return str(value.time())
+	return str(value)
+
+
+@frappe.whitelist()
+def get_employee_rows(department=None, designation=None, shift_template=None, existing=None):
+	"""Timesheet rows for the active employees of a department/designation, with the shift
+	template's times and the resulting hours, skipping the `existing` employees"""
+	frappe.has_permission("Project Timesheet", "write", throw=True)
+
+	shift = frappe._dict(checkin="08:00:00", checkout="17:00:00", break_hours=1)
+	shift_template = shift_template or frappe.db.get_value("Project Shift Template", {"is_default": 1})
+	if shift_template:
+		# Raises DoesNotExistError for an unknown template
+		shift = frappe.get_cached_doc("Project Shift Template", shift_template)
+
+	filters = {"status": "Active"}
+	if department:
+		filters["department"] = department
+	if designation:
+		filters["designation"] = designation
+
+	skip = set(frappe.parse_json(existing) or [])
+	rows = []
+	for employee in frappe.get_list(
+		"Employee", filters=filters, fields=["name", "employee_name", "designation"], order_by="name"
+	):
+		if employee.name in skip:
+			continue
+		skip.add(employee.name)
+
+		rows.append(
+			frappe._dict(
+				employee=employee.name,
+				employee_name=employee.employee_name,
+				designation=employee.designation,
+				checkin=str(get_time(shift.checkin)),
+				checkout=str(get_time(shift.checkout)),
+				checkin_2=str(get_time(shift.checkin_2)) if shift.checkin_2 is not None else None,
+				checkout_2=str(get_time(shift.checkout_2)) if shift.checkout_2 is not None else None,
+				break_hours=flt(shift.break_hours),
+			)
+		)
+
+	# Every row shares the template's times, so compute the hours once
+	if rows:
+		hours = calculate_row_hours(rows[:1])[0]
+		for row in rows:
+			row.working_hours = hours.working_hours
+			row.overtime = hours.overtime
+
+	return rows
+
+
+def on_doctype_update():
+	# Reports require a company and filter on docstatus and a date range
+	frappe.db.add_index("Project Timesheet", ["company", "docstatus", "date"])
+
+
+def create_employee_timesheets_in_background(docname):
+	"""Create ERPNext Timesheets in chunks, committing after each one.
+
+	Rows that already have a Timesheet are skipped, so a retried job
+	resumes where the failed one stopped.
+	"""
+	doc = frappe.get_doc("Project Timesheet", docname)
+	if doc.docstatus != 1:
+		return
+
+	# Rows sharing a Timesheet are kept next to each other, so no chunk splits them
+	pending = sorted(doc.get_pending_timesheet_rows(), key=doc.get_timesheet_group_key)
+	lookups = None
+
+	def process(rows):
+		nonlocal lookups
+		if lookups is None:
+			lookups = doc.get_timesheet_lookups(pending)
+		doc.create_timesheets_for_rows(rows, lookups)
+
+	process_rows_in_background(
+		doc, pending, process, _("Creating Employee Timesheets"), key=doc.get_timesheet_group_key
+	)
+
+
+def cancel_employee_timesheets_in_background(docname):
+	"""Cancel linked ERPNext Timesheets in chunks, committing after each one.
+
+	Links are cleared as their Timesheets are cancelled, so a retried job
+	only touches the rows that are still linked.
+	"""
+	doc = frappe.get_doc("Project Timesheet", docname)
+	if doc.docstatus != 2:
+		return
+
+	# Rows sharing a (consolidated) Timesheet are kept next to each other, so no chunk splits them
+	linked = sorted(
+		(row for row in doc.project_timesheet_details if row.timesheet), key=lambda row: row.timesheet
+	)
+	process_rows_in_background(
+		doc,
+		linked,
+		doc.cancel_timesheets_for_rows,
+		_("Cancelling Employee Timesheets"),
+		key=lambda row: row.timesheet,
+	)
+
+
+def process_rows_in_background(doc, rows, process, title, key=None):
+	"""Run `process` over `rows` in chunks, publishing progress and tracking the job status on `doc`.
+
+	With `key`, a chunk is extended until the key changes, so consecutive rows with the same key
+	are processed (and committed) together.
+	"""
+	doc.db_set("timesheet_creation_status", "In Progress", commit=True)
+	total = len(rows)
+
+	try:
+		start = 0
+		while start < total:
+			end = min(start + TIMESHEET_CHUNK_SIZE, total)
+			while key and end < total and key(rows[end]) == key(rows[end - 1]):
+				end += 1
+			process(rows[start:end])
+
+			frappe.db.commit()
+			start = end
+			frappe.publish_progress(
+				end * 100 / total,
+				title=title,
+				doctype=doc.doctype,
+				docname=doc.name,
+				description=_("{0} of {1} rows").format(end, total),
+			)
+	except Exception:
+		frappe.db.rollback()
+		doc.db_set("timesheet_creation_status", "Failed", commit=True)
+		doc.log_error(title)
+		doc.notify_update()
+		return
+
+	doc.db_set("timesheet_creation_status", "Completed", commit=True)
+	# Cached Detail report results show the Timesheet links written by this job
+	invalidate_report_cache(doc)
+	doc.notify_update()
+
+
+def cancel_submitted_timesheets(names):
+	"""Cancel the submitted Timesheets among `names` and return them.
+
+	The docstatus of all of them is read with one query; cancelled or
+	deleted Timesheets are skipped.
+	"""
+	if not names:
+		return set()
+
+	submitted = frappe.get_all(
+		"Timesheet", filters={"name": ("in", list(names)), "docstatus": 1}, pluck="name"
+	)
+	for name in submitted:
+		frappe.get_doc("Timesheet", name).cancel()
+
+	return set(submitted)
+
+
+def get_row_signature(row, date, company):
+	"""Everything an ERPNext Timesheet is built from, comparable between a row and its amendment"""
+	signature = [str(date), company]
+	for fieldname in ROW_SIGNATURE_FIELDS:
+		value = row.get(fieldname)
+		if fieldname.startswith("check"):
+			value = time_to_minutes(value)
+		elif fieldname in ("break_hours", "working_hours", "overtime"):
+			value = flt(value, 2)
+		else:
+			value = value or None
+		signature.append(value)
+
+	return tuple(signature)
+
+
+def set_timesheet_links(links):
+	"""Set the `timesheet` link of many detail rows with a single UPDATE.
+
+	`links` maps a detail row name to a Timesheet name, or None to clear it.
+	"""
+	if not links:
+		return
+
+	cases = " ".join(["WHEN %s THEN %s"] * len(links))
+	values = [value for pair in links.items() for value in pair]
+	frappe.db.sql(
+		f"""
+		UPDATE `tabProject Timesheet Details`
+		SET timesheet = CASE name {cases} END
+		WHERE name IN %s
+	""",
+		(*values, tuple(links)),
+	)
@@ -1,8 +1,15 @@
 # Copyright (c) 2026, CME and contributors
 # For license information, please see license.txt
 
+import frappe
 from frappe.model.document import Document
 
 
 class ProjectTimesheetDetails(Document):
 	pass
+
+
+def on_doctype_update():
+	# Report filters and punch ingestion look rows up by employee or project, then join on parent
+	frappe.db.add_index("Project Timesheet Details", ["employee", "parent"])
+	frappe.db.add_index("Project Timesheet Details", ["project", "parent"])
@@ -0,0 +1,147 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+import datetime
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import get_datetime, getdate, now
+
+from cmecustom.cmecustom.instrumentation import instrument
+from cmecustom.cmecustom.timesheet_hours import get_shift_datetimes, get_shift_intervals
+
+# Detail rows read (and their intervals written) per step when rebuilding
+REBUILD_CHUNK_SIZE = 1000
+
+
+class ProjectTimesheetInterval(Document):
+	"""One shift of a submitted Project Timesheet row as absolute datetimes.
+
+	Overnight shifts end on the next day, so overlaps across adjacent dates are a
+	plain range query. Maintained by `insert_intervals`/`delete_intervals` on
+	submit/cancel; `rebuild_intervals` regenerates the table.
+	"""
+
+
+INTERVAL_FIELDS = [
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"employee",
+	"project",
+	"project_timesheet",
+	"detail_row",
+	"from_time",
+	"to_time",
+]
+
+
+@instrument("project_timesheet.insert_intervals")
+def insert_intervals(doc):
+	"""Store the shifts of a submitted Project Timesheet's employee rows"""
+	frappe.db.bulk_insert(
+		"Project Timesheet Interval",
+		INTERVAL_FIELDS,
+		get_interval_values(doc.name, doc.date, doc.project_timesheet_details, now()),
+	)
+
+
+@instrument("project_timesheet.delete_intervals")
+def delete_intervals(doc):
+	frappe.db.delete("Project Timesheet Interval", {"project_timesheet": doc.name})
+
+
+def get_interval_values(parent, date, rows, timestamp):
+	date = getdate(date)
+	values = []
+	for row in rows:
+		if not row.employee:
+			continue
+		for shift_no, interval in enumerate(get_shift_intervals(row), start=1):
+			from_time, to_time = get_shift_datetimes(date, interval)
+			values.append(
+				(
+					# One interval per shift of a detail row, so the name cannot collide
+					f"{row.name}-{shift_no}",
+					timestamp,
+					timestamp,
+					frappe.session.user,
+					frappe.session.user,
+					row.employee,
+					row.project,
+					parent,
+					row.name,
+					from_time,
+					to_time,
+				)
+			)
+
+	return values
+
+
+def get_overlapping_intervals(employees, from_time, to_time, exclude=None):
+	"""Stored shifts of `employees` overlapping the `from_time` - `to_time` range"""
+	query, params = get_overlap_query(employees, from_time, to_time, exclude)
+	return frappe.db.sql(query, params, as_dict=True)
+
+
+def get_overlap_query(employees, from_time, to_time, exclude=None):
+	# A shift lasts at most a day, so only shifts starting after `from_time` - 1 day can reach it;
+	# this bounds the index range on (employee, from_time) to the checked period
+	query = """
+		SELECT project_timesheet as timesheet_name, employee, project, from_time, to_time
+		FROM `tabProject Timesheet Interval`
+		WHERE employee IN %(employees)s
+		AND from_time > %(earliest_start)s
+		AND from_time < %(to_time)s
+		AND to_time > %(from_time)s
+		AND project_timesheet != %(exclude)s
+	"""
+	params = {
+		"employees": tuple(employees),
+		"earliest_start": get_datetime(from_time) - datetime.timedelta(days=1),
+		"from_time": from_time,
+		"to_time": to_time,
+		"exclude": exclude or "",
+	}
+	return query, params
+
+
+def rebuild_intervals():
+	"""Regenerate the whole table from submitted Project Timesheets, one page of detail rows at a time"""
+	frappe.db.sql("DELETE FROM `tabProject Timesheet Interval`")
+
+	timestamp = now()
+	after = ""
+	while True:
+		rows = frappe.db.sql(
+			f"""
+			SELECT pt.name as parent, pt.date, ptd.name, ptd.employee, ptd.project,
+				ptd.checkin, ptd.checkout, ptd.checkin_2, ptd.checkout_2
+			FROM `tabProject Timesheet Details` ptd
+			INNER JOIN `tabProject Timesheet` pt ON pt.name = ptd.parent
+			WHERE pt.docstatus = 1
+			AND IFNULL(ptd.employee, '') != ''
+			AND ptd.name > %(after)s
+			ORDER BY ptd.name
+			LIMIT {REBUILD_CHUNK_SIZE}
+		""",
+			{"after": after},
+			as_dict=True,
+		)
+
+		values = []
+		for row in rows:
+			values.extend(get_interval_values(row.parent, row.date, [row], timestamp))
+		frappe.db.bulk_insert("Project Timesheet Interval", INTERVAL_FIELDS, values)
+
+		if len(rows) < REBUILD_CHUNK_SIZE:
+			break
+		after = rows[-1].name
+
+
+def on_doctype_update():
+	frappe.db.add_index("Project Timesheet Interval", ["employee", "from_time", "to_time"])
+	frappe.db.add_index("Project Timesheet Interval", ["project_timesheet"])
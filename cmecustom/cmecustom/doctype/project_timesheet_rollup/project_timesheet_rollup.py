@@ -0,0 +1,136 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, now
+
+from cmecustom.cmecustom.instrumentation import instrument
+
+
+class ProjectTimesheetRollup(Document):
+	"""Daily totals of submitted Project Timesheet rows per company, worker and project.
+
+	Maintained by `update_rollup` on submit/cancel; `rebuild_rollup` regenerates it.
+	"""
+
+
+def get_rollup_name(company, date, employee, external_worker_name, project):
+	"""Deterministic name for a rollup key (matches `ROLLUP_NAME_SQL`)"""
+	key = "|".join([company or "", str(date), employee or "", external_worker_name or "", project or ""])
+	return hashlib.md5(key.encode()).hexdigest()
+
+
+ROLLUP_NAME_SQL = """MD5(CONCAT_WS('|', IFNULL(pt.company, ''), pt.date, IFNULL(ptd.employee, ''),
+	IFNULL(ptd.external_worker_name, ''), IFNULL(ptd.project, '')))"""
+
+
+@instrument("project_timesheet.update_rollup")
+def update_rollup(doc, sign):
+	"""Add (`sign` = 1, on submit) or remove (`sign` = -1, on cancel) a Project Timesheet's rows"""
+	totals = {}
+	for row in doc.project_timesheet_details:
+		name = get_rollup_name(doc.company, doc.date, row.employee, row.external_worker_name, row.project)
+		if name not in totals:
+			totals[name] = {
+				"employee": row.employee or None,
+				"employee_name": row.employee_name,
+				"external_worker_name": row.external_worker_name or None,
+				"project": row.project or None,
+				"working_hours": 0,
+				"overtime": 0,
+				"row_count": 0,
+			}
+		totals[name]["working_hours"] += sign * flt(row.working_hours)
+		totals[name]["overtime"] += sign * flt(row.overtime)
+		totals[name]["row_count"] += sign
+
+	if not totals:
+		return
+
+	timestamp = now()
+	values = []
+	for name, entry in totals.items():
+		values.extend(
+			[
+				name,
+				timestamp,
+				timestamp,
+				frappe.session.user,
+				frappe.session.user,
+				doc.company,
+				doc.date,
+				entry["employee"],
+				entry["employee_name"],
+				entry["external_worker_name"],
+				entry["project"],
+				entry["working_hours"],
+				entry["overtime"],
+				entry["row_count"],
+			]
+		)
+
+	placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(totals))
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabProject Timesheet Rollup`
+			(name, creation, modified, owner, modified_by, company, date, employee, employee_name,
+			external_worker_name, project, working_hours, overtime, row_count)
+		VALUES {placeholders}
+		ON DUPLICATE KEY UPDATE
+			working_hours = working_hours + VALUES(working_hours),
+			overtime = overtime + VALUES(overtime),
+			row_count = row_count + VALUES(row_count),
+			modified = VALUES(modified)
+	""",
+		values,
+	)
+
+	if sign < 0:
+		frappe.db.sql(
+			"DELETE FROM `tabProject Timesheet Rollup` WHERE name IN %s AND row_count <= 0",
+			(tuple(totals),),
+		)
+
+
+def rebuild_rollup():
+	"""Regenerate the whole rollup from submitted Project Timesheets"""
+	frappe.db.sql("DELETE FROM `tabProject Timesheet Rollup`")
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabProject Timesheet Rollup`
+			(name, creation, modified, owner, modified_by, company, date, employee, employee_name,
+			external_worker_name, project, working_hours, overtime, row_count)
+		SELECT
+			{ROLLUP_NAME_SQL},
+			NOW(),
+			NOW(),
+			%(user)s,
+			%(user)s,
+			pt.company,
+			pt.date,
+			NULLIF(IFNULL(ptd.employee, ''), ''),
+			MAX(ptd.employee_name),
+			NULLIF(IFNULL(ptd.external_worker_name, ''), ''),
+			NULLIF(IFNULL(ptd.project, ''), ''),
+			SUM(ptd.working_hours),
+			SUM(ptd.overtime),
+			COUNT(*)
+		FROM `tabProject Timesheet Details` ptd
+		INNER JOIN `tabProject Timesheet` pt ON pt.name = ptd.parent
+		WHERE pt.docstatus = 1
+		GROUP BY
+			pt.company,
+			pt.date,
+			IFNULL(ptd.employee, ''),
+			IFNULL(ptd.external_worker_name, ''),
+			IFNULL(ptd.project, '')
+	""",
+		{"user": frappe.session.user},
+	)
+
+
+def on_doctype_update():
+	frappe.db.add_index("Project Timesheet Rollup", ["company", "date"])
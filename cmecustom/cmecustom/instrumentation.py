@@ -0,0 +1,122 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Opt-in timing of Project Timesheet hooks and report stages.
+
+Enable with `bench --site <site> set-config enable_timesheet_instrumentation 1`.
+Each stage decorated with `instrument` then records its wall time, SQL query
+count and row count. Every call is written to the `cmecustom.instrumentation`
+log as JSON and added to per-stage totals in Redis, which `metrics` serves in
+Prometheus text format. When disabled, a decorated call only adds a config lookup.
+"""
+
+import functools
+import json
+import time
+
+import frappe
+from redis import Redis
+from werkzeug.wrappers import Response
+
+METRICS_KEY = "timesheet_stage_metrics"
+
+# Redis hash field suffix -> Prometheus metric name and help text
+METRICS = {
+	"calls": ("cmecustom_stage_calls_total", "Number of times the stage ran"),
+	"seconds": ("cmecustom_stage_seconds_total", "Wall time spent in the stage"),
+	"queries": ("cmecustom_stage_sql_queries_total", "SQL queries issued by the stage"),
+	"rows": ("cmecustom_stage_rows_total", "Rows handled by the stage"),
+}
+
+
+def is_enabled():
+	return bool(frappe.conf.get("enable_timesheet_instrumentation"))
+
+
+def instrument(stage):
+	"""Decorator recording `stage` metrics for each call while instrumentation is enabled.
+
+	The row count is the length of a returned list (or the workers of a
+	returned report pivot), or else the number of Project Timesheet rows of a
+	document passed as first argument.
+	"""
+
+	def decorator(fn):
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			if not is_enabled():
+				return fn(*args, **kwargs)
+
+			queries = 0
+			sql = frappe.db.sql
+
+			def counting_sql(*sql_args, **sql_kwargs):
+				nonlocal queries
+				queries += 1
+				return sql(*sql_args, **sql_kwargs)
+
+			frappe.db.sql = counting_sql
+			start = time.perf_counter()
+			try:
+				result = fn(*args, **kwargs)
+			finally:
+				seconds = time.perf_counter() - start
+				frappe.db.sql = sql
+
+			record(stage, seconds, queries, get_row_count(args, result))
+			return result
+
+		return wrapper
+
+	return decorator
+
+
+def get_row_count(args, result):
+	if isinstance(result, list):
+		return len(result)
+	if isinstance(getattr(result, "workers", None), list):
+		return len(result.workers)
+	if args and hasattr(args[0], "project_timesheet_details"):
+		return len(args[0].project_timesheet_details)
+	return 0
+
+
+def record(stage, seconds, queries, rows):
+	frappe.logger("cmecustom.instrumentation", allow_site=True).info(
+		json.dumps(
+			{
+				"stage": stage,
+				"seconds": round(seconds, 6),
+				"queries": queries,
+				"rows": rows,
+				"user": frappe.session.user,
+			}
+		)
+	)
+
+	key = frappe.cache.make_key(METRICS_KEY)
+	pipeline = frappe.cache.pipeline()
+	for field, value in (("calls", 1), ("seconds", seconds), ("queries", queries), ("rows", rows)):
+		pipeline.hincrbyfloat(key, f"{stage}|{field}", value)
+	pipeline.execute()
+
+
+@frappe.whitelist()
+def metrics():
+	"""Stage totals in Prometheus text exposition format"""
+	frappe.only_for("System Manager")
+
+	# Raw Redis read: the values are plain numbers, not pickled like `frappe.cache.hgetall` expects
+	totals = {}
+	for field, value in Redis.hgetall(frappe.cache, frappe.cache.make_key(METRICS_KEY)).items():
+		stage, _sep, metric = frappe.safe_decode(field).rpartition("|")
+		totals.setdefault(metric, {})[stage] = float(value)
+
+	lines = []
+	for metric, (name, help_text) in METRICS.items():
+		lines.append(f"# HELP {name} {help_text}")
+		lines.append(f"# TYPE {name} counter")
+		for stage, value in sorted(totals.get(metric, {}).items()):
+			lines.append(f'{name}{{stage="{stage}"}} {value}')
+
+	return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
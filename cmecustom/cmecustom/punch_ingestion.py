@@ -0,0 +1,371 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Turn raw attendance punches into draft Project Timesheet rows.
+
+Punches (HRMS `Employee Checkin` records or a biometric device CSV export) are
+read as one stream sorted by employee and time. Consecutive IN/OUT punches are
+paired into a first and second shift per employee and day; further pairs
+extend the second shift, with the gaps counted as break. An OUT after
+midnight closes the shift opened the previous day, which is then an overnight
+shift as in `calculate_row_hours`. Only the punches of the current
+employee-day are held in memory. Rows are written in batches into one draft
+Project Timesheet per date and company.
+"""
+
+import csv
+from collections import namedtuple
+from itertools import pairwise
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, get_datetime, getdate, now
+
+from cmecustom.cmecustom.timesheet_hours import MINUTES_PER_DAY, calculate_row_hours
+
+# Punches read per query when streaming Employee Checkin records
+PUNCH_CHUNK_SIZE = 5000
+
+# Rows buffered before they are written to the database
+ROW_BATCH_SIZE = 500
+
+# Shortest IN/OUT pair kept as a shift (site config `punch_min_shift_minutes` overrides it).
+# A same-minute double tap would otherwise read as a 24 hour shift (checkout == checkin).
+MIN_SHIFT_MINUTES = 1
+
+Punch = namedtuple("Punch", ["employee", "time", "log_type"])
+
+
+@frappe.whitelist()
+def ingest_employee_checkins(from_date, to_date, company=None):
+	"""Create draft Project Timesheets from Employee Checkin records in the background"""
+	frappe.has_permission("Project Timesheet", "create", throw=True)
+	frappe.has_permission("Employee Checkin", "read", throw=True)
+
+	frappe.enqueue(
+		run_ingestion,
+		queue="long",
+		timeout=3600,
+		source="Employee Checkin",
+		from_date=from_date,
+		to_date=to_date,
+		company=company,
+		user=frappe.session.user,
+	)
+	frappe.msgprint(_("Punch ingestion has been queued."), alert=True)
+
+
+@frappe.whitelist()
+def ingest_punch_file(file_url):
+	"""Create draft Project Timesheets from a device export (employee, time, log_type; sorted by
+	employee and time) in the background"""
+	frappe.has_permission("Project Timesheet", "create", throw=True)
+
+	file_doc = frappe.get_doc("File", {"file_url": file_url})
+	file_doc.check_permission("read")
+
+	frappe.enqueue(
+		run_ingestion,
+		queue="long",
+		timeout=3600,
+		source="File",
+		file_path=file_doc.get_full_path(),
+		user=frappe.session.user,
+	)
+	frappe.msgprint(_("Punch ingestion has been queued."), alert=True)
+
+
+def run_ingestion(source, user, from_date=None, to_date=None, company=None, file_path=None):
+	if source == "File":
+		punches = iter_file_punches(file_path)
+	else:
+		punches = iter_checkin_punches(from_date, to_date, company)
+
+	min_minutes = cint(frappe.conf.get("punch_min_shift_minutes")) or MIN_SHIFT_MINUTES
+
+	writer = RowWriter()
+	for employee, date, shifts in pair_punches(punches, min_minutes):
+		writer.add(employee, date, shifts)
+	writer.flush()
+	writer.update_totals()
+
+	frappe.publish_realtime(
+		"msgprint",
+		_("Punch ingestion finished: {0} rows added to {1} draft Project Timesheets").format(
+			writer.row_count, len(writer.parents)
+		),
+		user=user,
+	)
+
+
+def iter_checkin_punches(from_date, to_date, company=None):
+	"""Stream Employee Checkin punches ordered by (employee, time), one keyset page at a time"""
+	# Include the next morning so overnight shifts of the last day can be closed
+	conditions = "ec.time >= %(from_time)s AND ec.time < %(to_time)s"
+	params = {"from_time": getdate(from_date), "to_time": add_days(getdate(to_date), 2)}
+	if company:
+		conditions += " AND e.company = %(company)s"
+		params["company"] = company
+
+	after = None
+	while True:
+		page_conditions = conditions
+		if after:
+			page_conditions += """ AND (ec.employee > %(after_employee)s
+				OR (ec.employee = %(after_employee)s AND (ec.time > %(after_time)s
+					OR (ec.time = %(after_time)s AND ec.name > %(after_name)s))))"""
+			params.update(after)
+
+		punches = frappe.db.sql(
+			f"""
+			SELECT ec.name, ec.employee, ec.time, ec.log_type
+			FROM `tabEmployee Checkin` ec
+			INNER JOIN `tabEmployee` e ON e.name = ec.employee
+			WHERE {page_conditions}
+			ORDER BY ec.employee, ec.time, ec.name
+			LIMIT {PUNCH_CHUNK_SIZE}
+		""",
+			params,
+			as_dict=True,
+		)
+
+		for punch in punches:
+			# Punches after `to_date` only close shifts opened on or before it
+			if getdate(punch.time) > getdate(to_date) and punch.log_type != "OUT":
+				continue
+			yield Punch(punch.employee, get_datetime(punch.time), punch.log_type)
+
+		if len(punches) < PUNCH_CHUNK_SIZE:
+			return
+
+		last = punches[-1]
+		after = {"after_employee": last.employee, "after_time": last.time, "after_name": last.name}
+
+
+def iter_file_punches(file_path):
+	"""Stream punches from a CSV export, which must be sorted by employee and time"""
+	previous = None
+	with open(file_path, newline="", encoding="utf-8-sig") as f:
+		for line, data in enumerate(csv.DictReader(f), start=2):
+			punch = Punch(
+				(data.get("employee") or "").strip(),
+				get_datetime(data.get("time")),
+				(data.get("log_type") or "").strip().upper() or None,
+			)
+			if previous and (punch.employee, punch.time) < (previous.employee, previous.time):
+				frappe.throw(_("Line {0}: punches must be sorted by employee and time").format(line))
+
+			previous = punch
+			yield punch
+
+
+def pair_punches(punches, min_minutes=MIN_SHIFT_MINUTES):
+	"""Pair a sorted punch stream into shifts, yielding `(employee, date, [(in, out), ...])`
+	once per employee and day.
+
+	A shift belongs to the day of its IN punch. Punches without a log type
+	alternate between IN and OUT. Repeated IN punches on the same day keep the
+	first one; an IN on a later day replaces an open IN whose OUT is missing.
+	Pairs shorter than `min_minutes` (counted in whole minutes, as the row
+	times are) or longer than a day are discarded.
+	"""
+	employee = date = opened = None
+	shifts = []
+
+	for punch in punches:
+		if punch.employee != employee:
+			if shifts:
+				yield employee, date, shifts
+			employee, date, opened, shifts = punch.employee, None, None, []
+
+		log_type = punch.log_type or ("OUT" if opened else "IN")
+
+		if log_type == "IN":
+			# A repeated IN keeps the first one, unless that one is from an earlier day and lost its OUT
+			if opened and punch.time.date() == opened.date():
+				continue
+			if date and punch.time.date() != date and shifts:
+				# First IN of a new day closes the previous employee-day
+				yield employee, date, shifts
+				shifts = []
+			date = punch.time.date()
+			opened = punch.time
+		elif opened:
+			minutes = int((truncate_to_minute(punch.time) - truncate_to_minute(opened)).total_seconds() // 60)
+			if min_minutes <= minutes < MINUTES_PER_DAY:
+				shifts.append((opened, punch.time))
+			opened = None
+
+	if shifts:
+		yield employee, date, shifts
+
+
+def truncate_to_minute(value):
+	return value.replace(second=0, microsecond=0)
+
+
+class RowWriter:
+	"""Buffers punch-derived rows and writes them into one draft Project Timesheet per date and company"""
+
+	def __init__(self):
+		self.buffer = []
+		self.parents = {}  # (date, company) -> [Project Timesheet name, last idx]
+		self.employees = {}  # employee -> (employee_name, company)
+		self.row_count = 0
+
+	def add(self, employee, date, shifts):
+		row = frappe._dict(employee=employee, break_hours=0)
+		row.checkin, row.checkout = (value.strftime("%H:%M:%S") for value in shifts[0])
+		if len(shifts) > 1:
+			row.checkin_2 = shifts[1][0].strftime("%H:%M:%S")
+			row.checkout_2 = shifts[-1][1].strftime("%H:%M:%S")
+			gaps = sum((start - end).total_seconds() for (_s, end), (start, _e) in pairwise(shifts[1:]))
+			row.break_hours = flt(gaps / 3600, 2)
+
+		self.buffer.append((date, row))
+		if len(self.buffer) >= ROW_BATCH_SIZE:
+			self.flush()
+
+	def flush(self):
+		if not self.buffer:
+			return
+
+		self.load_employees({row.employee for _date, row in self.buffer})
+		existing = self.get_existing_rows()
+
+		rows_by_key = {}
+		for date, row in self.buffer:
+			employee_name, company = self.employees.get(row.employee, (None, None))
+			if not company or (date, row.employee) in existing:
+				continue
+			row.employee_name = employee_name
+			rows_by_key.setdefault((date, company), []).append(row)
+
+		for key, rows in rows_by_key.items():
+			if key in self.parents:
+				self.append_rows(key, rows)
+			else:
+				self.create_parent(key, rows)
+			self.row_count += len(rows)
+
+		self.buffer = []
+		frappe.db.commit()
+
+	def load_employees(self, employees):
+		missing = [employee for employee in employees if employee not in self.employees]
+		if missing:
+			for name, employee_name, company in frappe.get_all(
+				"Employee",
+				filters={"name": ("in", missing)},
+				fields=["name", "employee_name", "company"],
+				as_list=True,
+			):
+				self.employees[name] = (employee_name, company)
+
+	def get_existing_rows(self):
+		"""(date, employee) pairs of the buffer already present in a draft or submitted sheet"""
+		return {
+			(getdate(date), employee)
+			for date, employee in frappe.db.sql(
+				"""
+				SELECT pt.date, ptd.employee
+				FROM `tabProject Timesheet` pt
+				INNER JOIN `tabProject Timesheet Details` ptd ON ptd.parent = pt.name
+				WHERE pt.docstatus < 2
+				AND pt.date IN %(dates)s
+				AND ptd.employee IN %(employees)s
+			""",
+				{
+					"dates": tuple({date for date, _row in self.buffer}),
+					"employees": tuple({row.employee for _date, row in self.buffer}),
+				},
+			)
+		}
+
+	def create_parent(self, key, rows):
+		doc = frappe.new_doc("Project Timesheet")
+		doc.date, doc.company = key
+		for row in rows:
+			doc.append("project_timesheet_details", row)
+
+		# Rows come from distinct employee-days that were checked against existing sheets above
+		doc.flags.ignore_overlap_warnings = True
+		doc.insert()
+		self.parents[key] = [doc.name, len(rows)]
+
+	def append_rows(self, key, rows):
+		parent, idx = self.parents[key]
+		timestamp = now()
+		fields = [
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"docstatus",
+			"parent",
+			"parenttype",
+			"parentfield",
+			"idx",
+			"employee",
+			"employee_name",
+			"checkin",
+			"checkout",
+			"checkin_2",
+			"checkout_2",
+			"break_hours",
+			"working_hours",
+			"overtime",
+		]
+
+		values = []
+		for row, hours in zip(rows, calculate_row_hours(rows), strict=True):
+			idx += 1
+			values.append(
+				(
+					# Unique per parent and position, so a batch cannot collide with itself
+					f"{parent}-{idx}",
+					timestamp,
+					timestamp,
+					frappe.session.user,
+					frappe.session.user,
+					0,
+					parent,
+					"Project Timesheet",
+					"project_timesheet_details",
+					idx,
+					row.employee,
+					row.employee_name,
+					row.checkin,
+					row.checkout,
+					row.get("checkin_2"),
+					row.get("checkout_2"),
+					row.break_hours,
+					hours.working_hours,
+					hours.overtime,
+				)
+			)
+
+		frappe.db.bulk_insert("Project Timesheet Details", fields, values)
+		self.parents[key][1] = idx
+
+	def update_totals(self):
+		"""Recompute the totals of every sheet that received bulk-inserted rows"""
+		names = [parent for parent, _idx in self.parents.values()]
+		if not names:
+			return
+
+		frappe.db.sql(
+			"""
+			UPDATE `tabProject Timesheet` pt
+			INNER JOIN (
+				SELECT parent, SUM(working_hours) as working_hours, SUM(overtime) as overtime
+				FROM `tabProject Timesheet Details`
+				WHERE parent IN %(names)s
+				GROUP BY parent
+			) totals ON totals.parent = pt.name
+			SET pt.total_working_hours = totals.working_hours, pt.total_overtime = totals.overtime
+		""",
+			{"names": tuple(names)},
+		)
+		frappe.db.commit()
@@ -0,0 +1,185 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Record the SQL issued by Project Timesheet lifecycle hooks and check it against a budget.
+
+Each query is attributed to the innermost line of this app that issued it.
+Every query starting in app code is budgeted, including the ones it runs
+through `frappe.get_all`, `frappe.get_doc` or `db_set`. Only queries run
+inside Frappe's document persistence (`Document.insert`/`save`/`submit`/
+`cancel`: child rows, and the hooks of the ERPNext Timesheets we save) are
+reported separately. The app's query count may grow at most
+logarithmically with the number of rows; a per-row query (N+1) fails.
+
+The sheets are checked with consolidated ERPNext Timesheets over a fixed
+set of employees, so the number of Timesheets saved does not grow with
+the rows either.
+
+	bench --site test.local check-timesheet-query-budget --company "Test Co"
+"""
+
+import math
+import sys
+import time
+from collections import Counter, namedtuple
+
+import frappe
+from frappe.utils import add_days, nowdate
+
+from cmecustom.cmecustom import instrumentation
+from cmecustom.cmecustom.benchmark import make_employees
+
+# Row counts compared by `check_query_budget` (below the background job threshold)
+BUDGET_SIZES = (5, 20, 80)
+
+# Employees sharing the rows of a checked sheet; each works up to 24 half-hour shifts a day
+BUDGET_EMPLOYEES = 4
+
+# Frappe document persistence: queries issued below these methods are the cost of saving a document
+PERSISTENCE_MODULES = ("frappe.model.document", "frappe.model.base_document")
+PERSISTENCE_METHODS = {
+	"insert",
+	"save",
+	"_save",
+	"submit",
+	"_submit",
+	"cancel",
+	"_cancel",
+	"db_insert",
+	"db_update",
+}
+
+# Extra app queries allowed per doubling of the row count
+QUERIES_PER_DOUBLING = 1
+
+# `category` is "app" (issued by this app), "document" (document persistence
+# reached from app code) or "framework" (Frappe's own save/submit/cancel of the checked sheet)
+RecordedQuery = namedtuple("RecordedQuery", ["query", "duration", "origin", "category"])
+
+
+class QueryRecorder:
+	"""Context manager recording every `frappe.db.sql` call made while it is active"""
+
+	def __init__(self):
+		self.queries = []
+		self._sql = None
+
+	def __enter__(self):
+		self._sql = frappe.db.sql
+
+		def sql(query, *args, **kwargs):
+			start = time.perf_counter()
+			try:
+				return self._sql(query, *args, **kwargs)
+			finally:
+				self.queries.append(
+					RecordedQuery(str(query), time.perf_counter() - start, *get_query_origin())
+				)
+
+		frappe.db.sql = sql
+		return self
+
+	def __exit__(self, *exc_info):
+		frappe.db.sql = self._sql
+
+	def count(self, category="app"):
+		return sum(1 for query in self.queries if query.category == category)
+
+	def duration(self, category="app"):
+		return sum(query.duration for query in self.queries if query.category == category)
+
+	def by_origin(self, category="app"):
+		return Counter(query.origin for query in self.queries if query.category == category)
+
+
+def get_query_origin():
+	"""`(origin, category)` of the query being run, from the call stack"""
+	persistence = False
+	frame = sys._getframe(2)
+	while frame:
+		module = frame.f_globals.get("__name__", "")
+		if module in PERSISTENCE_MODULES and frame.f_code.co_name in PERSISTENCE_METHODS:
+			persistence = True
+		elif module.startswith("cmecustom.") and module not in (__name__, instrumentation.__name__):
+			origin = f"{module}:{frame.f_lineno} ({frame.f_code.co_name})"
+			return origin, "document" if persistence else "app"
+		frame = frame.f_back
+
+	return None, "framework"
+
+
+def record_lifecycle(company, row_count):
+	"""Record the queries of validate/insert, submit and cancel of a generated sheet.
+
+	The `row_count` rows are spread over `BUDGET_EMPLOYEES` employees, one
+	ERPNext Timesheet each. Everything is rolled back to a savepoint afterwards,
+	so the caller's transaction is left as it was. Returns a `QueryRecorder` per stage.
+	"""
+	recorders = {}
+	frappe.db.savepoint("query_budget")
+	try:
+		doc = frappe.new_doc("Project Timesheet")
+		doc.date = add_days(nowdate(), 1)
+		doc.company = company
+		doc.consolidate_timesheets = 1
+
+		employees = make_employees(company, BUDGET_EMPLOYEES)
+		for idx in range(row_count):
+			hour = idx // BUDGET_EMPLOYEES
+			doc.append(
+				"project_timesheet_details",
+				{
+					"employee": employees[idx % BUDGET_EMPLOYEES],
+					"checkin": f"{hour:02d}:00:00",
+					"checkout": f"{hour:02d}:30:00",
+				},
+			)
+
+		for stage, method in (("insert", doc.insert), ("submit", doc.submit), ("cancel", doc.cancel)):
+			with QueryRecorder() as recorder:
+				method()
+			recorders[stage] = recorder
+	finally:
+		frappe.db.rollback(save_point="query_budget")
+		frappe.local.message_log = []
+
+	return recorders
+
+
+def check_query_budget(company, sizes=BUDGET_SIZES):
+	"""Fail if the app's queries per stage grow faster than logarithmically with the row count"""
+	sizes = sorted(int(size) for size in sizes)
+	if sizes[-1] > BUDGET_EMPLOYEES * 24:
+		raise ValueError(
+			f"At most {BUDGET_EMPLOYEES * 24} rows fit on one day of {BUDGET_EMPLOYEES} employees"
+		)
+	recorded = {size: record_lifecycle(company, size) for size in sizes}
+
+	smallest, largest = sizes[0], sizes[-1]
+	allowance = math.ceil(math.log2(largest / smallest)) * QUERIES_PER_DOUBLING
+
+	failures = []
+	for stage, base in recorded[smallest].items():
+		largest_recorder = recorded[largest][stage]
+		if largest_recorder.count() - base.count() <= allowance:
+			continue
+
+		# Origins whose count grew with the rows are the likely N+1 patterns
+		growth = largest_recorder.by_origin() - base.by_origin()
+		failures.append(
+			f"{stage}: {base.count()} app queries for {smallest} rows, "
+			f"{largest_recorder.count()} for {largest} rows (allowed +{allowance})\n"
+			+ "\n".join(f"\t+{count}\t{origin}" for origin, count in growth.most_common())
+		)
+
+	for size in sizes:
+		print(
+			f"{size} rows: "
+			+ ", ".join(
+				f"{stage} {recorder.count()} app / {recorder.count('document')} document queries"
+				for stage, recorder in recorded[size].items()
+			)
+		)
+
+	if failures:
+		raise AssertionError("Query budget exceeded:\n" + "\n".join(failures))
@@ -0,0 +1,82 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Check that the overlap query and the report queries use the indexes.
+
+A synthetic data set (see `benchmark`) spanning several years is generated,
+the table statistics are refreshed, and every query is run through EXPLAIN
+with filters covering a few weeks. A full table scan (`type=ALL`) of a large
+table fails the check. The generated data is removed afterwards.
+
+It commits (ANALYZE TABLE does implicitly) and rebuilds the rollup table, so
+it runs as a bench command on a disposable site, not in the test suite.
+
+	bench --site bench.local check-timesheet-query-plans --company "Bench Co"
+"""
+
+import frappe
+from frappe.utils import add_days, get_datetime, getdate
+
+from cmecustom.cmecustom.benchmark import DATA_PREFIX, clear_data, generate_data
+from cmecustom.cmecustom.doctype.project_timesheet_interval.project_timesheet_interval import (
+	get_overlap_query,
+)
+from cmecustom.cmecustom.report.project_timesheet_detail import project_timesheet_detail
+from cmecustom.cmecustom.report.project_timesheet_monthly import project_timesheet_monthly
+from cmecustom.cmecustom.report.project_timesheet_summary import project_timesheet_summary
+
+# Data set checked: one sheet per day for about three years
+PLAN_DETAIL_ROWS = 20_000
+PLAN_EMPLOYEES = 20
+
+# Tables that grow with the number of timesheet rows, as named (or aliased) in EXPLAIN output
+LARGE_TABLES = {
+	"pt": "tabProject Timesheet",
+	"ptd": "tabProject Timesheet Details",
+	"r": "tabProject Timesheet Rollup",
+	"tabProject Timesheet Interval": "tabProject Timesheet Interval",
+}
+
+
+def check_query_plans(company):
+	"""Fail if a checked query scans a large table in full"""
+	try:
+		clear_data()
+		last_date = generate_data(company, PLAN_DETAIL_ROWS, PLAN_EMPLOYEES, PLAN_EMPLOYEES)
+		for table in LARGE_TABLES.values():
+			frappe.db.sql(f"ANALYZE TABLE `{table}`")
+
+		failures = []
+		for name, (query, params) in get_checked_queries(company, last_date).items():
+			plan = frappe.db.sql(f"EXPLAIN {query}", params, as_dict=True)
+			for step in plan:
+				if step.table in LARGE_TABLES and step.type == "ALL":
+					failures.append(f"{name}: full scan of {LARGE_TABLES[step.table]} ({step.rows} rows)")
+			print(f"{name}: " + ", ".join(f"{step.table} {step.type} {step.key or '-'}" for step in plan))
+	finally:
+		clear_data()
+		frappe.db.commit()
+
+	if failures:
+		raise AssertionError("Queries without a usable index:\n" + "\n".join(failures))
+
+
+def get_checked_queries(company, last_date):
+	"""`(query, params)` of each checked query, keyed by name, for the weeks before `last_date`"""
+	first_day = getdate(add_days(last_date, -27))
+	filters = frappe._dict(company=company, from_date=first_day, to_date=last_date)
+	employee = f"{DATA_PREFIX}-EMP-00000"
+
+	return {
+		"overlap": get_overlap_query(
+			[f"{DATA_PREFIX}-EMP-{i:05d}" for i in range(PLAN_EMPLOYEES)],
+			get_datetime(last_date),
+			get_datetime(add_days(last_date, 2)),
+		),
+		"report:detail": project_timesheet_detail.get_query(filters),
+		"report:detail (employee)": project_timesheet_detail.get_query(
+			frappe._dict(filters, employee=employee)
+		),
+		"report:summary": project_timesheet_summary.get_query(filters, "Employee and Project"),
+		"report:monthly": project_timesheet_monthly.get_pivot_query(first_day, last_date, None, company),
+	}
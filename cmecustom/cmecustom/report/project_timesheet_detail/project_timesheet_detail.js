@@ -37,5 +37,65 @@ frappe.query_reports["Project Timesheet Detail"] = {
 			fieldtype: "Link",
 			options: "Employee",
 		},
+		{
+			fieldname: "page_length",
+			label: __("Rows per Page"),
+			fieldtype: "Select",
+			options: ["", "500", "1000", "5000"],
+		},
+		{
+			// Set by the "Next Page" button; cleared whenever another filter changes
+			fieldname: "cursor",
+			label: __("Page Cursor"),
+			fieldtype: "Data",
+			hidden: 1,
+		},
 	],
+
+	onload(report) {
+		// Large ranges are exported in the background instead of through the browser
+		["CSV", "Excel"].forEach((file_format) => {
+			report.page.add_inner_button(
+				__(file_format),
+				() => {
+					frappe.call({
+						method: "cmecustom.cmecustom.report.project_timesheet_detail.project_timesheet_detail.export_report",
+						args: { filters: report.get_values(), file_format: file_format },
+					});
+				},
+				__("Export in Background")
+			);
+		});
+
+		// With "Rows per Page" set, each run returns one page; its last row carries the next cursor
+		report.page.add_inner_button(
+			__("Next Page"),
+			() => {
+				let last = (report.data || [])[(report.data || []).length - 1];
+				if (!last || !last.next_cursor) {
+					frappe.show_alert(__("There are no further pages"));
+					return;
+				}
+				report.set_filter_value("cursor", last.next_cursor);
+			},
+			__("Pages")
+		);
+		report.page.add_inner_button(__("First Page"), () => reset_page(report), __("Pages"));
+	},
 };
+
+function reset_page(report) {
+	// Clearing the cursor refreshes the report itself
+	if (report.get_filter_value("cursor")) {
+		report.set_filter_value("cursor", "");
+	} else {
+		report.refresh();
+	}
+}
+
+// A page cursor only makes sense for the filters it was read with
+frappe.query_reports["Project Timesheet Detail"].filters.forEach((filter) => {
+	if (filter.fieldname !== "cursor") {
+		filter.on_change = reset_page;
+	}
+});
@@ -1,19 +1,40 @@
 # Copyright (c) 2026, CME and contributors
 # For license information, please see license.txt
 
+import base64
+import csv
+import json
+
 import frappe
 from frappe import _
-from frappe.utils import flt
+from frappe.utils import cint, flt
+
+from cmecustom.cmecustom.instrumentation import instrument
+from cmecustom.cmecustom.report_cache import get_cached_report
+from cmecustom.cmecustom.report_query import DETAIL_FILTER_COLUMNS, get_conditions
+
+MAX_PAGE_LENGTH = 5000
 
 
 def execute(filters=None):
 	if not filters:
 		filters = {}
 
-	columns = get_columns()
-	data = get_data(filters)
+	# Paged mode: one keyset page per run, the next page's cursor is set on the last row
+	if cint(filters.get("page_length")):
+		page = fetch_page(filters, filters.get("cursor"), filters.get("page_length"))
+		if page["data"] and page["next_cursor"]:
+			page["data"][-1]["next_cursor"] = page["next_cursor"]
+		return get_columns(), page["data"]
 
-	return columns, data
+	return get_cached_report(
+		"Project Timesheet Detail",
+		filters,
+		filters.get("company"),
+		filters.get("from_date"),
+		filters.get("to_date"),
+		lambda: (get_columns(), get_data(filters)),
+	)
 
 
 def format_number(value):
@@ -83,7 +104,7 @@ def get_columns():
 
 def format_time(time_val):
 	"""Format time - show only hours and minutes"""
-	if not time_val:
+	if time_val is None or time_val == "":
 		return ""
 	time_str = str(time_val)
 	# Remove seconds if present
@@ -92,35 +113,46 @@ def format_time(time_val):
 	return time_str
 
 
+@instrument("project_timesheet_detail.get_data")
 def get_data(filters):
-	conditions = "pt.docstatus = 1"
-	params = {}
+	query, params = get_query(filters)
+	return [format_row(row) for row in frappe.db.sql(query, params, as_dict=True)]
+
 
-	if filters.get("from_date"):
-		conditions += " AND pt.date >= %(from_date)s"
-		params["from_date"] = filters.get("from_date")
+def iter_data(filters):
+	"""Yield formatted rows one at a time from an unbuffered (server-side) cursor"""
+	query, params = get_query(filters)
+	with frappe.db.unbuffered_cursor():
+		for row in frappe.db.sql(query, params, as_dict=True, as_iterator=True):
+			yield format_row(row)
 
-	if filters.get("to_date"):
-		conditions += " AND pt.date <= %(to_date)s"
-		params["to_date"] = filters.get("to_date")
 
-	if filters.get("company"):
-		conditions += " AND pt.company = %(company)s"
-		params["company"] = filters.get("company")
+def get_query(filters, after=None, page_length=None):
+	"""Report query; `after` (a decoded page cursor) and `page_length` select a keyset page"""
+	conditions, params = get_conditions(filters, DETAIL_FILTER_COLUMNS, base="pt.docstatus = 1")
 
-	if filters.get("project"):
-		conditions += " AND ptd.project = %(project)s"
-		params["project"] = filters.get("project")
+	if after:
+		# Rows that sort after the cursor's (date DESC, employee_name, external_worker_name, name)
+		conditions += """ AND (
+			pt.date < %(after_date)s
+			OR (pt.date = %(after_date)s AND (
+				IFNULL(ptd.employee_name, '') > %(after_employee_name)s
+				OR (IFNULL(ptd.employee_name, '') = %(after_employee_name)s AND (
+					IFNULL(ptd.external_worker_name, '') > %(after_external_worker_name)s
+					OR (IFNULL(ptd.external_worker_name, '') = %(after_external_worker_name)s
+						AND ptd.name > %(after_name)s)
+				))
+			))
+		)"""
+		params.update({f"after_{key}": value for key, value in after.items()})
 
-	if filters.get("employee"):
-		conditions += " AND ptd.employee = %(employee)s"
-		params["employee"] = filters.get("employee")
+	limit = f"LIMIT {cint(page_length)}" if page_length else ""
 
-	data = frappe.db.sql(
-		f"""
+	query = f"""
 		SELECT
 			pt.date,
 			pt.name as project_timesheet,
+			ptd.name as detail_name,
 			ptd.employee,
 			ptd.employee_name,
 			ptd.external_worker_name,
@@ -137,33 +169,158 @@ def get_data(filters):
 		FROM `tabProject Timesheet Details` ptd
 		INNER JOIN `tabProject Timesheet` pt ON pt.name = ptd.parent
 		WHERE {conditions}
-		ORDER BY pt.date DESC, ptd.employee_name, ptd.external_worker_name
-	""",
-		params,
-		as_dict=True,
-	)
+		ORDER BY
+			pt.date DESC,
+			IFNULL(ptd.employee_name, ''),
+			IFNULL(ptd.external_worker_name, ''),
+			ptd.name
+		{limit}
+	"""
+
+	return query, params
+
+
+def format_row(row):
+	return {
+		"date": row.date,
+		"project_timesheet": row.project_timesheet,
+		"employee": row.employee,
+		"worker_name": row.employee_name or row.external_worker_name,
+		"worker_type": "Employee" if row.employee else "External",
+		"project": row.project,
+		"checkin": format_time(row.checkin),
+		"checkout": format_time(row.checkout),
+		"checkin_2": format_time(row.checkin_2),
+		"checkout_2": format_time(row.checkout_2),
+		"break_hours": format_number(row.break_hours),
+		"working_hours": format_number(row.working_hours),
+		"overtime": format_number(row.overtime),
+		"timesheet": row.timesheet,
+		"remarks": row.remarks,
+	}
+
 
-	# Format data
-	result = []
-	for row in data:
-		result.append(
+@frappe.whitelist()
+def get_page(filters=None, cursor=None, page_length=500):
+	"""Return one page of report rows and the cursor of the next page (None on the last page).
+
+	Pages are selected by the ordering key of the last row instead of an
+	OFFSET, so every page costs the same to fetch.
+	"""
+	check_report_permission()
+	return fetch_page(frappe.parse_json(filters) or {}, cursor, page_length)
+
+
+def fetch_page(filters, cursor=None, page_length=500):
+	page_length = min(max(cint(page_length), 1), MAX_PAGE_LENGTH)
+	after = decode_cursor(cursor) if cursor else None
+
+	query, params = get_query(filters, after=after, page_length=page_length)
+	rows = frappe.db.sql(query, params, as_dict=True)
+
+	next_cursor = None
+	if len(rows) == page_length:
+		last = rows[-1]
+		next_cursor = encode_cursor(
 			{
-				"date": row.date,
-				"project_timesheet": row.project_timesheet,
-				"employee": row.employee,
-				"worker_name": row.employee_name or row.external_worker_name,
-				"worker_type": "Employee" if row.employee else "External",
-				"project": row.project,
-				"checkin": format_time(row.checkin),
-				"checkout": format_time(row.checkout),
-				"checkin_2": format_time(row.checkin_2),
-				"checkout_2": format_time(row.checkout_2),
-				"break_hours": format_number(row.break_hours),
-				"working_hours": format_number(row.working_hours),
-				"overtime": format_number(row.overtime),
-				"timesheet": row.timesheet,
-				"remarks": row.remarks,
+				"date": str(last.date),
+				"employee_name": last.employee_name or "",
+				"external_worker_name": last.external_worker_name or "",
+				"name": last.detail_name,
 			}
 		)
 
-	return result
+	return {"data": [format_row(row) for row in rows], "next_cursor": next_cursor}
+
+
+def encode_cursor(key):
+	return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+	try:
+		key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+		return {field: str(key[field]) for field in ("date", "employee_name", "external_worker_name", "name")}
+	except (ValueError, KeyError, TypeError):
+		frappe.throw(_("Invalid page cursor"))
+
+
+def check_report_permission():
+	if not frappe.get_doc("Report", "Project Timesheet Detail").is_permitted():
+		frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+
+@frappe.whitelist()
+def export_report(filters, file_format="CSV"):
+	"""Export the report to a private file in a background job"""
+	check_report_permission()
+
+	if file_format not in ("CSV", "Excel"):
+		frappe.throw(_("Unsupported export format {0}").format(file_format))
+
+	filters = frappe.parse_json(filters) or {}
+	frappe.enqueue(
+		build_export,
+		queue="long",
+		timeout=3600,
+		filters=filters,
+		file_format=file_format,
+		user=frappe.session.user,
+	)
+	frappe.msgprint(_("The export is being prepared. You will be notified when it is ready."), alert=True)
+
+
+def build_export(filters, file_format, user):
+	"""Write the report row by row to a private file and attach it to the report"""
+	columns = get_columns()
+	fieldnames = [column["fieldname"] for column in columns]
+	extension = "csv" if file_format == "CSV" else "xlsx"
+	file_name = f"project_timesheet_detail_{frappe.generate_hash(length=8)}.{extension}"
+	path = frappe.get_site_path("private", "files", file_name)
+
+	if file_format == "CSV":
+		write_csv(path, columns, fieldnames, iter_data(filters))
+	else:
+		write_xlsx(path, columns, fieldnames, iter_data(filters))
+
+	file_doc = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": file_name,
+			"file_url": f"/private/files/{file_name}",
+			"is_private": 1,
+			"attached_to_doctype": "Report",
+			"attached_to_name": "Project Timesheet Detail",
+		}
+	)
+	file_doc.owner = user
+	file_doc.insert(ignore_permissions=True)
+
+	frappe.publish_realtime(
+		"msgprint",
+		_("Project Timesheet Detail export is ready: {0}").format(
+			f'<a href="{file_doc.file_url}" target="_blank">{file_name}</a>'
+		),
+		user=user,
+	)
+
+
+def write_csv(path, columns, fieldnames, rows):
+	with open(path, "w", newline="", encoding="utf-8") as f:
+		writer = csv.writer(f)
+		writer.writerow([column["label"] for column in columns])
+		for row in rows:
+			writer.writerow([row[fieldname] for fieldname in fieldnames])
+
+
+def write_xlsx(path, columns, fieldnames, rows):
+	from openpyxl import Workbook
+
+	# Write-only mode streams rows to disk instead of keeping the sheet in memory
+	workbook = Workbook(write_only=True)
+	sheet = workbook.create_sheet("Project Timesheet Detail")
+	sheet.append([column["label"] for column in columns])
+	for row in rows:
+		sheet.append([row[fieldname] for fieldname in fieldnames])
+
+	workbook.save(path)
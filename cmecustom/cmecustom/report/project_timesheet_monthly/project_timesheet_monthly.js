@@ -40,6 +40,17 @@ frappe.query_reports["Project Timesheet Monthly"] = {
 			default: String(new Date().getMonth() + 1).padStart(2, "0"),
 			reqd: 1,
 		},
+		{
+			fieldname: "period",
+			label: __("Period"),
+			fieldtype: "Select",
+			options: [
+				{ value: "Month", label: __("Month") },
+				{ value: "Quarter", label: __("Quarter") },
+				{ value: "Year", label: __("Year") },
+			],
+			default: "Month",
+		},
 		{
 			fieldname: "project",
 			label: __("Project"),
@@ -2,10 +2,22 @@
 # For license information, please see license.txt
 
 import calendar
+from array import array
+from collections import namedtuple
 
 import frappe
 from frappe import _
-from frappe.utils import add_days, flt, get_first_day, get_last_day, getdate
+from frappe.utils import add_days, add_months, date_diff, flt, get_first_day, get_last_day, getdate
+
+from cmecustom.cmecustom.instrumentation import instrument
+from cmecustom.cmecustom.report_cache import get_cached_report
+from cmecustom.cmecustom.report_query import ROLLUP_FILTER_COLUMNS, get_conditions
+
+# Months covered by each "Period" option
+PERIOD_MONTHS = {"Month": 1, "Quarter": 3, "Year": 12}
+
+# Workers x days grid: `hours[i][d]` is worker i's working hours on day d of the range
+Pivot = namedtuple("Pivot", ["workers", "hours", "overtime", "row_totals", "column_totals"])
 
 
 def execute(filters=None):
@@ -21,19 +33,41 @@ def execute(filters=None):
 	if not month or not year:
 		frappe.throw(_("Please select Month and Year"))
 
-	# Get first and last day of month
-	first_day = getdate(f"{year}-{month}-01")
-	last_day = get_last_day(first_day)
-	num_days = last_day.day
+	first_day, last_day = get_period_range(year, month, filters.get("period") or "Month")
 
-	# Build columns - Employee + each day of month
-	columns = get_columns(num_days, first_day)
+	return get_cached_report(
+		"Project Timesheet Monthly",
+		filters,
+		company,
+		first_day,
+		last_day,
+		lambda: get_report(first_day, last_day, project, company),
+	)
+
+
+def get_period_range(year, month, period):
+	"""First and last day of the month, or of the quarter/year containing it"""
+	if period == "Year":
+		first_day = getdate(f"{year}-01-01")
+	elif period == "Quarter":
+		first_day = getdate(f"{year}-{(int(month) - 1) // 3 * 3 + 1:02d}-01")
+	else:
+		first_day = getdate(f"{year}-{month}-01")
+
+	last_day = get_last_day(add_months(first_day, PERIOD_MONTHS.get(period, 1) - 1))
+	return first_day, last_day
+
+
+def get_report(first_day, last_day, project=None, company=None):
+	num_days = date_diff(last_day, first_day) + 1
 
-	# Get data
-	data = get_data(first_day, last_day, num_days, project, company)
+	# Build columns - Employee + each day of the range
+	columns = get_columns(num_days, first_day)
 
-	# Get chart
-	chart = get_chart(data, num_days)
+	# Pivot once; totals and chart come from the numbers, not the formatted cells
+	pivot = get_pivot(first_day, last_day, num_days, project, company)
+	data = get_data(pivot, num_days)
+	chart = get_chart(pivot, num_days, first_day)
 
 	return columns, data, None, chart
 
@@ -59,14 +93,16 @@ def get_columns(num_days, first_day):
 		},
 	]
 
-	# Add column for each day with day name
+	# Add column for each day with day name (and month, when the range spans several)
 	day_names_short = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+	multi_month = num_days > get_last_day(first_day).day
 	for day in range(1, num_days + 1):
 		date = add_days(first_day, day - 1)
 		day_name = day_names_short[date.weekday()]
+		day_label = f"{date.day}/{date.month}" if multi_month else date.day
 		columns.append(
 			{
-				"label": f"{day_name}<br>{day}",
+				"label": f"{day_name}<br>{day_label}",
 				"fieldname": f"day_{day}",
 				"fieldtype": "Data",
 				"width": 45,
@@ -97,98 +133,98 @@ def get_columns(num_days, first_day):
 	return columns
 
 
-def get_data(first_day, last_day, num_days, project=None, company=None):
-	# Build conditions
-	conditions = "pt.docstatus = 1 AND pt.date BETWEEN %(first_day)s AND %(last_day)s"
-	params = {"first_day": first_day, "last_day": last_day}
-
-	if project:
-		conditions += " AND ptd.project = %(project)s"
-		params["project"] = project
+@instrument("project_timesheet_monthly.get_pivot")
+def get_pivot(first_day, last_day, num_days, project=None, company=None):
+	# Get all timesheet details for the range
+	query, params = get_pivot_query(first_day, last_day, project, company)
+	entries = frappe.db.sql(query, params, as_dict=True)
 
-	if company:
-		conditions += " AND pt.company = %(company)s"
-		params["company"] = company
+	# One dense row of day cells per employee/worker, in order of first appearance
+	positions = {}
+	workers, hours, overtime = [], [], array("d")
+	for entry in entries:
+		# Key is employee or external worker name
+		key = entry.employee or f"ext_{entry.external_worker_name}"
+		position = positions.get(key)
+		if position is None:
+			position = positions[key] = len(workers)
+			workers.append(
+				{
+					"employee": entry.employee,
+					"employee_name": entry.employee_name
+					if entry.employee
+					else f"[External] {entry.external_worker_name}",
+				}
+			)
+			hours.append(array("d", bytes(8 * num_days)))
+			overtime.append(0)
+
+		hours[position][(getdate(entry.date) - first_day).days] += flt(entry.working_hours)
+		overtime[position] += flt(entry.overtime)
+
+	row_totals = array("d", (sum(row) for row in hours))
+	column_totals = array("d", (sum(column) for column in zip(*hours, strict=True))) if hours else array("d")
+
+	return Pivot(workers, hours, overtime, row_totals, column_totals)
+
+
+def get_pivot_query(first_day, last_day, project=None, company=None):
+	# Build conditions (the daily rollup only holds submitted timesheets)
+	conditions, params = get_conditions(
+		{"from_date": first_day, "to_date": last_day, "project": project, "company": company},
+		ROLLUP_FILTER_COLUMNS,
+	)
 
-	# Get all timesheet details for the month
-	entries = frappe.db.sql(
-		f"""
+	query = f"""
 		SELECT
-			ptd.employee,
-			ptd.employee_name,
-			ptd.external_worker_name,
-			pt.date,
-			SUM(ptd.working_hours) as working_hours,
-			SUM(ptd.overtime) as overtime
-		FROM `tabProject Timesheet Details` ptd
-		INNER JOIN `tabProject Timesheet` pt ON pt.name = ptd.parent
+			r.employee,
+			r.employee_name,
+			r.external_worker_name,
+			r.date,
+			SUM(r.working_hours) as working_hours,
+			SUM(r.overtime) as overtime
+		FROM `tabProject Timesheet Rollup` r
 		WHERE {conditions}
-		GROUP BY ptd.employee, ptd.employee_name, ptd.external_worker_name, pt.date
-		ORDER BY ptd.employee_name, ptd.external_worker_name, pt.date
-	""",
-		params,
-		as_dict=True,
-	)
+		GROUP BY r.employee, r.employee_name, r.external_worker_name, r.date
+		ORDER BY r.employee_name, r.external_worker_name, r.date
+	"""
 
-	# Organize data by employee/worker
-	employee_data = {}
-	for entry in entries:
-		# Key is employee or external worker name
-		if entry.employee:
-			key = entry.employee
-			name = entry.employee_name
-		else:
-			key = f"ext_{entry.external_worker_name}"
-			name = f"[External] {entry.external_worker_name}"
-
-		if key not in employee_data:
-			employee_data[key] = {
-				"employee": entry.employee,
-				"employee_name": name,
-				"days": {},
-				"total_hours": 0,
-				"total_overtime": 0,
-			}
+	return query, params
 
-		day_num = getdate(entry.date).day
-		employee_data[key]["days"][day_num] = flt(entry.working_hours)
-		employee_data[key]["total_hours"] += flt(entry.working_hours)
-		employee_data[key]["total_overtime"] += flt(entry.overtime)
 
-	# Convert to list format
+@instrument("project_timesheet_monthly.get_data")
+def get_data(pivot, num_days):
 	data = []
-	for _key, emp in employee_data.items():
+	for position, worker in enumerate(pivot.workers):
 		row = {
-			"employee": emp["employee"],
-			"employee_name": emp["employee_name"],
-			"total_hours": format_number(emp["total_hours"]),
-			"total_overtime": format_number(emp["total_overtime"]),
+			"employee": worker["employee"],
+			"employee_name": worker["employee_name"],
+			"total_hours": format_number(pivot.row_totals[position]),
+			"total_overtime": format_number(pivot.overtime[position]),
 		}
 		# Add day columns
+		cells = pivot.hours[position]
 		for day in range(1, num_days + 1):
-			row[f"day_{day}"] = format_number(emp["days"].get(day, 0))
+			row[f"day_{day}"] = format_number(cells[day - 1])
 
 		data.append(row)
 
 	return data
 
 
-def get_chart(data, num_days):
-	if not data:
+@instrument("project_timesheet_monthly.get_chart")
+def get_chart(pivot, num_days, first_day):
+	if not pivot.workers:
 		return None
 
-	# Aggregate hours per day
-	daily_totals = [0] * num_days
-	for row in data:
-		for day in range(1, num_days + 1):
-			val = row.get(f"day_{day}", 0)
-			if val:
-				daily_totals[day - 1] += float(val) if val else 0
+	labels = [str(d) for d in range(1, num_days + 1)]
+	if num_days > get_last_day(first_day).day:
+		labels = [f"{add_days(first_day, d).day}/{add_days(first_day, d).month}" for d in range(num_days)]
 
 	return {
 		"data": {
-			"labels": [str(d) for d in range(1, num_days + 1)],
-			"datasets": [{"name": _("Total Hours"), "values": daily_totals}],
+			"labels": labels,
+			"datasets": [{"name": _("Total Hours"), "values": list(pivot.column_totals)}],
 		},
 		"type": "bar",
 		"height": 200,
@@ -2,6 +2,12 @@
 // For license information, please see license.txt
 
 frappe.query_reports["Project Timesheet Summary"] = {
+	// "Employee and Project" rows are nested under each employee's subtotal
+	tree: true,
+	name_field: "row_key",
+	parent_field: "parent_row_key",
+	initial_depth: 1,
+
 	filters: [
 		{
 			fieldname: "company",
@@ -46,4 +52,13 @@ frappe.query_reports["Project Timesheet Summary"] = {
 			options: "Employee",
 		},
 	],
+
+	formatter(value, row, column, data, default_formatter) {
+		value = default_formatter(value, row, column, data);
+		// Employee subtotals and the grand total
+		if (data && data.bold) {
+			value = `<b>${value}</b>`;
+		}
+		return value;
+	},
 };
@@ -5,11 +5,26 @@ import frappe
 from frappe import _
 from frappe.utils import flt
 
+from cmecustom.cmecustom.instrumentation import instrument
+from cmecustom.cmecustom.report_cache import get_cached_report
+from cmecustom.cmecustom.report_query import ROLLUP_FILTER_COLUMNS, get_conditions
+
 
 def execute(filters=None):
 	if not filters:
 		filters = {}
 
+	return get_cached_report(
+		"Project Timesheet Summary",
+		filters,
+		filters.get("company"),
+		filters.get("from_date"),
+		filters.get("to_date"),
+		lambda: get_report(filters),
+	)
+
+
+def get_report(filters):
 	group_by = filters.get("group_by", "Employee")
 
 	columns = get_columns(group_by)
@@ -115,146 +130,118 @@ def get_columns(group_by):
 	return columns
 
 
-def get_data(filters, group_by):
-	conditions = "pt.docstatus = 1"
-	params = {}
+# Grouping columns per "Group By" option; totals and subtotals come from WITH ROLLUP
+GROUP_BY_KEYS = {
+	"Employee": ["worker_key"],
+	"Project": ["project_key"],
+	"Employee and Project": ["worker_key", "project_key"],
+}
 
-	if filters.get("from_date"):
-		conditions += " AND pt.date >= %(from_date)s"
-		params["from_date"] = filters.get("from_date")
+# External workers are keyed by name; the prefix keeps them apart from Employee IDs
+KEY_COLUMNS = {
+	"worker_key": "IFNULL(r.employee, CONCAT('ext:', r.external_worker_name))",
+	"project_key": "IFNULL(r.project, '')",
+}
 
-	if filters.get("to_date"):
-		conditions += " AND pt.date <= %(to_date)s"
-		params["to_date"] = filters.get("to_date")
 
-	if filters.get("company"):
-		conditions += " AND pt.company = %(company)s"
-		params["company"] = filters.get("company")
+@instrument("project_timesheet_summary.get_data")
+def get_data(filters, group_by):
+	if group_by not in GROUP_BY_KEYS:
+		return []
 
-	if filters.get("project"):
-		conditions += " AND ptd.project = %(project)s"
-		params["project"] = filters.get("project")
+	query, params = get_query(filters, group_by)
+	data = frappe.db.sql(query, params, as_dict=True)
 
-	if filters.get("employee"):
-		conditions += " AND ptd.employee = %(employee)s"
-		params["employee"] = filters.get("employee")
+	keys = GROUP_BY_KEYS[group_by]
+	result = []
+	for row in data:
+		working = flt(row.working_hours)
+		ot = flt(row.overtime)
+		entry = {
+			"total_days": row.total_days,
+			"working_hours": format_number(working),
+			"overtime": format_number(ot),
+			"total_hours": format_number(working + ot),
+		}
 
-	if group_by == "Employee":
-		data = frappe.db.sql(
-			f"""
-			SELECT
-				ptd.employee,
-				ptd.employee_name,
-				ptd.external_worker_name,
-				COUNT(DISTINCT pt.date) as total_days,
-				SUM(ptd.working_hours) as working_hours,
-				SUM(ptd.overtime) as overtime
-			FROM `tabProject Timesheet Details` ptd
-			INNER JOIN `tabProject Timesheet` pt ON pt.name = ptd.parent
-			WHERE {conditions}
-			GROUP BY ptd.employee, ptd.employee_name, ptd.external_worker_name
-			ORDER BY ptd.employee_name, ptd.external_worker_name
-		""",
-			params,
-			as_dict=True,
-		)
-
-		result = []
-		for row in data:
-			working = flt(row.working_hours)
-			ot = flt(row.overtime)
-			result.append(
+		if row.get(keys[0]) is None:
+			# Grand total
+			entry.update({"is_total": 1, "bold": 1, "indent": 0})
+			entry["worker_name" if "worker_key" in keys else "project_name"] = _("Total")
+		elif group_by == "Project":
+			entry.update(
 				{
-					"employee": row.employee,
-					"worker_name": row.employee_name or row.external_worker_name,
-					"worker_type": "Employee" if row.employee else "External",
-					"total_days": row.total_days,
-					"working_hours": format_number(working),
-					"overtime": format_number(ot),
-					"total_hours": format_number(working + ot),
-				}
-			)
-		return result
-
-	elif group_by == "Project":
-		data = frappe.db.sql(
-			f"""
-			SELECT
-				ptd.project,
-				p.project_name,
-				COUNT(DISTINCT pt.date) as total_days,
-				SUM(ptd.working_hours) as working_hours,
-				SUM(ptd.overtime) as overtime
-			FROM `tabProject Timesheet Details` ptd
-			INNER JOIN `tabProject Timesheet` pt ON pt.name = ptd.parent
-			LEFT JOIN `tabProject` p ON p.name = ptd.project
-			WHERE {conditions}
-			GROUP BY ptd.project, p.project_name
-			ORDER BY ptd.project
-		""",
-			params,
-			as_dict=True,
-		)
-
-		result = []
-		for row in data:
-			working = flt(row.working_hours)
-			ot = flt(row.overtime)
-			result.append(
-				{
-					"project": row.project or "(No Project)",
+					"row_key": row.project_key or "(No Project)",
+					"indent": 0,
+					"project": row.project_key or "(No Project)",
 					"project_name": row.project_name or "(No Project)",
-					"total_days": row.total_days,
-					"working_hours": format_number(working),
-					"overtime": format_number(ot),
-					"total_hours": format_number(working + ot),
 				}
 			)
-		return result
-
-	elif group_by == "Employee and Project":
-		data = frappe.db.sql(
-			f"""
-			SELECT
-				ptd.employee,
-				ptd.employee_name,
-				ptd.external_worker_name,
-				ptd.project,
-				COUNT(DISTINCT pt.date) as total_days,
-				SUM(ptd.working_hours) as working_hours,
-				SUM(ptd.overtime) as overtime
-			FROM `tabProject Timesheet Details` ptd
-			INNER JOIN `tabProject Timesheet` pt ON pt.name = ptd.parent
-			WHERE {conditions}
-			GROUP BY ptd.employee, ptd.employee_name, ptd.external_worker_name, ptd.project
-			ORDER BY ptd.employee_name, ptd.external_worker_name, ptd.project
-		""",
-			params,
-			as_dict=True,
-		)
-
-		result = []
-		for row in data:
-			working = flt(row.working_hours)
-			ot = flt(row.overtime)
-			result.append(
+		else:
+			entry.update(
 				{
+					"row_key": row.worker_key,
+					"indent": 0,
 					"employee": row.employee,
 					"worker_name": row.employee_name or row.external_worker_name,
 					"worker_type": "Employee" if row.employee else "External",
-					"project": row.project or "(No Project)",
-					"total_days": row.total_days,
-					"working_hours": format_number(working),
-					"overtime": format_number(ot),
-					"total_hours": format_number(working + ot),
 				}
 			)
-		return result
+			if len(keys) > 1 and row.project_key is None:
+				# Employee subtotal
+				entry["bold"] = 1
+			elif len(keys) > 1:
+				# Employee x project row under the employee's subtotal
+				entry.update(
+					{
+						"row_key": f"{row.worker_key}|{row.project_key}",
+						"parent_row_key": row.worker_key,
+						"indent": 1,
+						"project": row.project_key or "(No Project)",
+					}
+				)
+
+		result.append(entry)
+
+	return result
+
+
+def get_query(filters, group_by):
+	"""Report query for a valid `group_by` option and its parameters"""
+	keys = GROUP_BY_KEYS[group_by]
+
+	# Read the daily rollup maintained on submit/cancel instead of the raw timesheet rows
+	conditions, params = get_conditions(filters, ROLLUP_FILTER_COLUMNS)
+
+	# One scan returns every group, the per-employee subtotals and the grand total (all keys NULL)
+	query = f"""
+		SELECT * FROM (
+			SELECT
+				{", ".join(f"{KEY_COLUMNS[key]} as {key}" for key in keys)},
+				MAX(r.employee) as employee,
+				MAX(r.employee_name) as employee_name,
+				MAX(r.external_worker_name) as external_worker_name,
+				MAX(p.project_name) as project_name,
+				COUNT(DISTINCT r.date) as total_days,
+				SUM(r.working_hours) as working_hours,
+				SUM(r.overtime) as overtime
+			FROM `tabProject Timesheet Rollup` r
+			LEFT JOIN `tabProject` p ON p.name = r.project
+			WHERE {conditions}
+			GROUP BY {", ".join(KEY_COLUMNS[key] for key in keys)} WITH ROLLUP
+		) t
+		ORDER BY
+			t.{keys[0]} IS NULL,
+			{"t.employee_name, t.external_worker_name, t.worker_key" if "worker_key" in keys else "t.project_key"}
+			{", t.project_key IS NOT NULL, t.project_key" if len(keys) > 1 else ""}
+	"""
 
-	return []
+	return query, params
 
 
+@instrument("project_timesheet_summary.get_chart")
 def get_chart(data, group_by):
+	data = [row for row in data if not row.get("is_total")]
 	if not data:
 		return None
 
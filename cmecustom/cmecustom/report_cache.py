@@ -0,0 +1,70 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Redis cache for the Project Timesheet reports.
+
+Results are keyed by report and normalized filters. Each entry also records
+the company and date range it covers, so submitting or cancelling a Project
+Timesheet only drops the entries that include its company and date. Index
+entries of results that have expired are pruned at the same time.
+"""
+
+import hashlib
+import json
+import time
+
+import frappe
+from frappe.utils import getdate
+
+CACHE_INDEX_KEY = "project_timesheet_report_cache"
+CACHE_EXPIRY = 24 * 60 * 60  # seconds
+
+
+def get_cached_report(report_name, filters, company, from_date, to_date, compute):
+	"""Return the cached result of `compute()` for these filters, computing and storing it if missing"""
+	key = get_cache_key(report_name, filters)
+
+	result = frappe.cache.get_value(key)
+	if result is None:
+		result = compute()
+		frappe.cache.set_value(key, result, expires_in_sec=CACHE_EXPIRY)
+		frappe.cache.hset(
+			CACHE_INDEX_KEY,
+			key,
+			{
+				"company": company,
+				"from_date": str(getdate(from_date)) if from_date else None,
+				"to_date": str(getdate(to_date)) if to_date else None,
+				"expires_at": time.time() + CACHE_EXPIRY,
+			},
+		)
+
+	return result
+
+
+def get_cache_key(report_name, filters):
+	normalized = {key: str(value) for key, value in filters.items() if value not in (None, "", [])}
+	digest = hashlib.md5(
+		json.dumps([report_name, frappe.local.lang, normalized], sort_keys=True).encode()
+	).hexdigest()
+	return f"{CACHE_INDEX_KEY}::{digest}"
+
+
+def invalidate_report_cache(doc, method=None):
+	"""Drop cached report results covering the company and date of a submitted/cancelled Project Timesheet"""
+	date = str(getdate(doc.date))
+	now = time.time()
+
+	for key, scope in (frappe.cache.hgetall(CACHE_INDEX_KEY) or {}).items():
+		key = frappe.safe_decode(key)
+		# Expired results (and entries of unknown expiry) are dropped whatever their scope
+		if scope.get("expires_at", 0) > now:
+			if scope["company"] and scope["company"] != doc.company:
+				continue
+			if (scope["from_date"] and date < scope["from_date"]) or (
+				scope["to_date"] and date > scope["to_date"]
+			):
+				continue
+
+		frappe.cache.delete_value(key)
+		frappe.cache.hdel(CACHE_INDEX_KEY, key)
@@ -0,0 +1,49 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Filter handling shared by the Project Timesheet reports."""
+
+# Report filter -> comparison it applies
+FILTER_OPERATORS = {
+	"from_date": ">=",
+	"to_date": "<=",
+	"company": "=",
+	"project": "=",
+	"employee": "=",
+}
+
+# Filter columns for queries on the raw timesheet rows (`pt` = Project Timesheet, `ptd` = Details)
+DETAIL_FILTER_COLUMNS = {
+	"from_date": "pt.date",
+	"to_date": "pt.date",
+	"company": "pt.company",
+	"project": "ptd.project",
+	"employee": "ptd.employee",
+}
+
+# Filter columns for queries on the daily rollup (`r` = Project Timesheet Rollup)
+ROLLUP_FILTER_COLUMNS = {
+	"from_date": "r.date",
+	"to_date": "r.date",
+	"company": "r.company",
+	"project": "r.project",
+	"employee": "r.employee",
+}
+
+
+def get_conditions(filters, columns, base="1 = 1"):
+	"""Compile the report filters into a WHERE clause and its parameters.
+
+	`columns` maps each supported filter to the column it applies to;
+	filters without a value are skipped.
+	"""
+	conditions = [base]
+	params = {}
+
+	for key, column in columns.items():
+		value = filters.get(key)
+		if value:
+			conditions.append(f"{column} {FILTER_OPERATORS[key]} %({key})s")
+			params[key] = value
+
+	return " AND ".join(conditions), params
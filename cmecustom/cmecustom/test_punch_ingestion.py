@@ -0,0 +1,93 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+import datetime
+import unittest
+
+from cmecustom.cmecustom.punch_ingestion import Punch, pair_punches
+
+
+def punch(time, log_type=None, employee="EMP-1"):
+	return Punch(employee, datetime.datetime.fromisoformat(time), log_type)
+
+
+def shift(start, end):
+	return (datetime.datetime.fromisoformat(start), datetime.datetime.fromisoformat(end))
+
+
+class TestPairPunches(unittest.TestCase):
+	def test_day_and_overnight_shifts(self):
+		punches = [
+			punch("2026-03-01 08:00", "IN"),
+			punch("2026-03-01 17:00", "OUT"),
+			punch("2026-03-02 22:00", "IN"),
+			punch("2026-03-03 06:00", "OUT"),
+		]
+		self.assertEqual(
+			list(pair_punches(punches)),
+			[
+				("EMP-1", datetime.date(2026, 3, 1), [shift("2026-03-01 08:00", "2026-03-01 17:00")]),
+				("EMP-1", datetime.date(2026, 3, 2), [shift("2026-03-02 22:00", "2026-03-03 06:00")]),
+			],
+		)
+
+	def test_repeated_in_keeps_the_first(self):
+		punches = [
+			punch("2026-03-01 08:00", "IN"),
+			punch("2026-03-01 08:05", "IN"),
+			punch("2026-03-01 17:00", "OUT"),
+		]
+		self.assertEqual(
+			list(pair_punches(punches)),
+			[("EMP-1", datetime.date(2026, 3, 1), [shift("2026-03-01 08:00", "2026-03-01 17:00")])],
+		)
+
+	def test_missing_evening_out(self):
+		# The open IN of 1 Mar must not swallow the 2 Mar shift
+		punches = [
+			punch("2026-03-01 20:00", "IN"),
+			punch("2026-03-02 08:00", "IN"),
+			punch("2026-03-02 17:00", "OUT"),
+		]
+		self.assertEqual(
+			list(pair_punches(punches)),
+			[("EMP-1", datetime.date(2026, 3, 2), [shift("2026-03-02 08:00", "2026-03-02 17:00")])],
+		)
+
+	def test_missing_morning_out(self):
+		punches = [
+			punch("2026-03-01 08:00", "IN"),
+			punch("2026-03-02 08:00", "IN"),
+			punch("2026-03-02 17:00", "OUT"),
+		]
+		self.assertEqual(
+			list(pair_punches(punches)),
+			[("EMP-1", datetime.date(2026, 3, 2), [shift("2026-03-02 08:00", "2026-03-02 17:00")])],
+		)
+
+	def test_missing_in(self):
+		punches = [
+			punch("2026-03-01 17:00", "OUT"),
+			punch("2026-03-02 08:00", "IN"),
+			punch("2026-03-02 17:00", "OUT"),
+		]
+		self.assertEqual(
+			list(pair_punches(punches)),
+			[("EMP-1", datetime.date(2026, 3, 2), [shift("2026-03-02 08:00", "2026-03-02 17:00")])],
+		)
+
+	def test_same_minute_double_tap_is_dropped(self):
+		punches = [
+			punch("2026-03-01 08:00:10", "IN"),
+			punch("2026-03-01 08:00:40", "OUT"),
+			punch("2026-03-01 09:00", "IN"),
+			punch("2026-03-01 17:00", "OUT"),
+		]
+		self.assertEqual(
+			list(pair_punches(punches)),
+			[("EMP-1", datetime.date(2026, 3, 1), [shift("2026-03-01 09:00", "2026-03-01 17:00")])],
+		)
+
+	def test_open_in_of_previous_employee_is_dropped(self):
+		punches = [punch("2026-03-01 08:00", "IN"), punch("2026-03-01 09:00", "OUT", employee="EMP-2")]
+		self.assertEqual(list(pair_punches(punches)), [])
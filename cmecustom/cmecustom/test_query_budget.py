@@ -0,0 +1,13 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+from frappe.tests import IntegrationTestCase
+
+from cmecustom.cmecustom.benchmark import get_or_create_company
+from cmecustom.cmecustom.query_budget import check_query_budget
+
+
+class TestQueryBudget(IntegrationTestCase):
+	def test_no_queries_per_row(self):
+		# Generated sheets are rolled back to a savepoint; the company goes with the test's transaction
+		check_query_budget(get_or_create_company())
@@ -0,0 +1,39 @@
+// Runs the cases of timesheet_hours_cases.json against `get_row_hours` of the form script,
+// so the client and server calculations cannot drift apart.
+//
+//	node --test cmecustom/cmecustom/test_timesheet_hours.js
+
+const assert = require("node:assert");
+const fs = require("node:fs");
+const path = require("node:path");
+const test = require("node:test");
+const vm = require("node:vm");
+
+const form_script = path.join(__dirname, "doctype", "project_timesheet", "project_timesheet.js");
+const cases = require("./timesheet_hours_cases.json");
+
+function load_form_script() {
+	// Just enough of the desk globals for the script to load
+	let context = vm.createContext({
+		frappe: { ui: { form: { on() {} } } },
+		flt(value, precision) {
+			value = parseFloat(value) || 0;
+			if (precision === undefined) return value;
+			let factor = Math.pow(10, precision);
+			return Math.round(value * factor) / factor;
+		},
+		cint(value) {
+			return parseInt(value, 10) || 0;
+		},
+	});
+	vm.runInContext(fs.readFileSync(form_script, "utf8"), context, { filename: form_script });
+	return context;
+}
+
+const { get_row_hours } = load_form_script();
+
+for (let { description, row, working_hours, overtime } of cases) {
+	test(description, () => {
+		assert.deepStrictEqual({ ...get_row_hours(row) }, { working_hours, overtime });
+	});
+}
@@ -0,0 +1,70 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+import datetime
+import json
+import os
+import unittest
+
+import frappe
+
+from cmecustom.cmecustom.timesheet_hours import calculate_row_hours, get_shift_intervals, time_to_minutes
+
+# Shared with test_timesheet_hours.js, which runs the same cases against the form script
+CASES_PATH = os.path.join(os.path.dirname(__file__), "timesheet_hours_cases.json")
+
+
+class TestTimesheetHours(unittest.TestCase):
+	def test_row_hours(self):
+		with open(CASES_PATH) as f:
+			cases = json.load(f)
+
+		rows = [frappe._dict(case["row"]) for case in cases]
+		for case, hours in zip(cases, calculate_row_hours(rows), strict=True):
+			with self.subTest(case["description"]):
+				self.assertEqual(hours.working_hours, case["working_hours"])
+				self.assertEqual(hours.overtime, case["overtime"])
+
+		# Intervals parsed once by the caller give the same hours
+		shift_intervals = [get_shift_intervals(row) for row in rows]
+		self.assertEqual(calculate_row_hours(rows, shift_intervals), calculate_row_hours(rows))
+
+	def test_time_to_minutes(self):
+		self.assertEqual(time_to_minutes("08:30:15"), 510)
+		self.assertEqual(time_to_minutes("00:00:00"), 0)
+		self.assertEqual(time_to_minutes(datetime.time(8, 30)), 510)
+		self.assertEqual(time_to_minutes(datetime.timedelta(hours=8, minutes=30, seconds=15)), 510)
+		# Midnight as loaded from the database is set, not missing
+		self.assertEqual(time_to_minutes(datetime.timedelta(0)), 0)
+		self.assertIsNone(time_to_minutes(None))
+		self.assertIsNone(time_to_minutes(""))
+
+	def test_database_times(self):
+		"""Time fields read from the database arrive as timedelta; the hours must match the string form"""
+		for checkin, checkout, second_shift, working_hours in (
+			("00:00:00", "08:00:00", None, 8),
+			("16:00:00", "00:00:00", None, 8),
+			("18:00:00", "23:00:00", ("00:00:00", "02:00:00"), 7),
+			("08:00:00", "12:00:00", ("00:00:00", "00:00:00"), 4),
+		):
+			row = frappe._dict(checkin=checkin, checkout=checkout, break_hours=0)
+			if second_shift:
+				row.checkin_2, row.checkout_2 = second_shift
+			db_row = frappe._dict(
+				{
+					field: to_timedelta(value) if field != "break_hours" else value
+					for field, value in row.items()
+				}
+			)
+
+			with self.subTest(f"{checkin} - {checkout}, second shift {second_shift}"):
+				self.assertEqual(
+					[(i.start, i.end) for i in get_shift_intervals(db_row)],
+					[(i.start, i.end) for i in get_shift_intervals(row)],
+				)
+				self.assertEqual(calculate_row_hours([db_row])[0].working_hours, working_hours)
+
+
+def to_timedelta(value):
+	hours, minutes, seconds = (int(part) for part in value.split(":"))
+	return datetime.timedelta(hours=hours, minutes=minutes, seconds=seconds)
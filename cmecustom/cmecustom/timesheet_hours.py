@@ -0,0 +1,117 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Shift, working hours and overtime calculation for Project Timesheet rows.
+
+Each time field is parsed once into integer minutes from midnight. The same
+rules are implemented in `project_timesheet.js` (`time_to_minutes` and
+`get_row_hours`), so both sides must be changed together. The cases in
+`timesheet_hours_cases.json` are checked against both implementations.
+"""
+
+import datetime
+import heapq
+from collections import namedtuple
+
+from frappe.utils import flt
+
+STANDARD_HOURS = 8  # Standard working hours per day
+MINUTES_PER_DAY = 1440
+
+# A shift normalized to minutes from midnight of the timesheet date
+ShiftInterval = namedtuple("ShiftInterval", ["start", "end", "checkin", "checkout"])
+
+# Hours of a row: raw shift hours, break deducted, and the resulting working hours/overtime
+RowHours = namedtuple("RowHours", ["shift_hours", "break_hours", "working_hours", "overtime"])
+
+
+def time_to_minutes(value):
+	"""Minutes from midnight of a Time field value (str, time or timedelta), seconds ignored"""
+	# Midnight loaded from the database is `timedelta(0)`, which is falsy but set
+	if value is None or value == "":
+		return None
+
+	if isinstance(value, datetime.timedelta):
+		return int(value.total_seconds() // 60) % MINUTES_PER_DAY
+
+	if isinstance(value, datetime.time | datetime.datetime):
+		return value.hour * 60 + value.minute
+
+	hours, _sep, rest = str(value).partition(":")
+	return int(hours) * 60 + int(rest[:2] or 0)
+
+
+def get_shift_intervals(row):
+	"""Return the first and second shift of a row as minute intervals, handling overnight shifts"""
+	intervals = []
+
+	checkin, checkout = time_to_minutes(row.checkin), time_to_minutes(row.checkout)
+	if checkin is not None and checkout is not None:
+		intervals.append(make_shift_interval(checkin, checkout, row.checkin, row.checkout))
+
+	checkin_2, checkout_2 = time_to_minutes(row.checkin_2), time_to_minutes(row.checkout_2)
+	# Second shift of 00:00:00 - 00:00:00 means it was not used
+	if checkin_2 is not None and checkout_2 is not None and (checkin_2 or checkout_2):
+		intervals.append(make_shift_interval(checkin_2, checkout_2, row.checkin_2, row.checkout_2))
+
+	return intervals
+
+
+def make_shift_interval(start, end, checkin, checkout):
+	# If checkout is earlier than checkin, it's an overnight shift
+	if end <= start:
+		end += MINUTES_PER_DAY
+
+	return ShiftInterval(start, end, checkin, checkout)
+
+
+def get_shift_datetimes(date, interval):
+	"""Absolute start and end of a `ShiftInterval` on the timesheet `date`"""
+	midnight = datetime.datetime.combine(date, datetime.time())
+	return (
+		midnight + datetime.timedelta(minutes=interval.start),
+		midnight + datetime.timedelta(minutes=interval.end),
+	)
+
+
+def calculate_row_hours(rows, shift_intervals=None):
+	"""Compute `RowHours` for every row in one pass.
+
+	`shift_intervals` may hold the rows' `get_shift_intervals`, in row order, when already parsed.
+	"""
+	if shift_intervals is None:
+		shift_intervals = [get_shift_intervals(row) for row in rows]
+
+	result = []
+	for row, intervals in zip(rows, shift_intervals, strict=True):
+		shift_minutes = sum(interval.end - interval.start for interval in intervals)
+		shift_hours = shift_minutes / 60
+		break_hours = flt(row.break_hours)
+
+		# Deduct break hours
+		net_hours = max(shift_hours - break_hours, 0)
+		overtime = flt(net_hours - STANDARD_HOURS, 2) if net_hours > STANDARD_HOURS else 0
+
+		result.append(RowHours(shift_hours, break_hours, flt(net_hours, 2), overtime))
+
+	return result
+
+
+def find_overlapping_intervals(items, key=lambda item: item):
+	"""Yield every pair of overlapping intervals using a single sorted sweep.
+
+	`key` maps an item to its `ShiftInterval`. Pairs are yielded as
+	(earlier, later) by start time.
+	"""
+	ordered = sorted(items, key=lambda item: (key(item).start, key(item).end))
+	active = []  # heap of (end, position, item) for intervals still open
+
+	for position, item in enumerate(ordered):
+		interval = key(item)
+		while active and active[0][0] <= interval.start:
+			heapq.heappop(active)
+
+		for _end, _position, other in active:
+			yield other, item
+
+		heapq.heappush(active, (interval.end, position, item))
@@ -0,0 +1,306 @@
+# Copyright (c) 2026, CME and contributors
+# For license information, please see license.txt
+
+"""Bulk import of Project Timesheets from a CSV file.
+
+Rows are grouped by (date, company) into one Project Timesheet each. Checks
+that concern a single row (worker, time format, overlaps with other rows of
+the same sheet) run while the file is read, so their errors stay on that
+row's line. Overlaps with submitted timesheets, and with the sheets imported
+before in the batch, are checked for a whole batch with one query, and every
+input row gets a status in the result file instead of stopping at the first
+failure.
+"""
+
+import csv
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, get_datetime, getdate, strip_html
+
+from cmecustom.cmecustom.doctype.project_timesheet_interval.project_timesheet_interval import (
+	get_overlapping_intervals,
+)
+from cmecustom.cmecustom.timesheet_hours import (
+	find_overlapping_intervals,
+	get_shift_datetimes,
+	get_shift_intervals,
+	time_to_minutes,
+)
+
+# Documents validated and inserted (then committed) together
+IMPORT_CHUNK_SIZE = 20
+
+IMPORT_FIELDS = (
+	"employee",
+	"external_worker_name",
+	"project",
+	"checkin",
+	"checkout",
+	"checkin_2",
+	"checkout_2",
+	"break_hours",
+	"remarks",
+)
+TIME_FIELDS = ("checkin", "checkout", "checkin_2", "checkout_2")
+
+
+@frappe.whitelist()
+def import_timesheets(file_url, submit=0):
+	"""Import a CSV of crew-day rows (date, company, employee or external_worker_name,
+	project, checkin, checkout, checkin_2, checkout_2, break_hours, remarks) in the background"""
+	frappe.has_permission("Project Timesheet", "create", throw=True)
+	if cint(submit):
+		frappe.has_permission("Project Timesheet", "submit", throw=True)
+
+	file_doc = frappe.get_doc("File", {"file_url": file_url})
+	file_doc.check_permission("read")
+
+	frappe.enqueue(
+		run_import,
+		queue="long",
+		timeout=3600,
+		file_path=file_doc.get_full_path(),
+		submit=cint(submit),
+		user=frappe.session.user,
+	)
+	frappe.msgprint(_("The import has been queued. You will be notified when it is complete."), alert=True)
+
+
+def run_import(file_path, submit, user):
+	"""Import the file in committed batches; whatever happens, the user gets the per-row results"""
+	results = []
+	batch = []
+	error = None
+
+	try:
+		groups = read_groups(file_path, results)
+
+		keys = list(groups)
+		for start in range(0, len(keys), IMPORT_CHUNK_SIZE):
+			batch = [(key, groups[key]) for key in keys[start : start + IMPORT_CHUNK_SIZE]]
+			import_batch(batch, submit)
+			frappe.db.commit()
+		batch = []
+	except Exception as e:
+		# Batches committed before stay imported; the failed one is rolled back
+		frappe.db.rollback()
+		frappe.log_error(_("Project Timesheet import failed"))
+		error = strip_html(str(e)) or _("The import failed")
+
+		for _key, rows in batch:
+			for _row, result in rows:
+				if result[1] == "Imported":
+					result[1:4] = ["", "", ""]
+		for result in results:
+			if not result[1]:
+				result[1:3] = ["Not Imported", error]
+
+	report_url = write_results(results)
+	download = f'<a href="{report_url}" target="_blank">{_("Download results")}</a>'
+	failed = sum(1 for result in results if result[1] != "Imported")
+	if error:
+		message = _("Project Timesheet import stopped after {0} rows ({1} not imported): {2}. {3}").format(
+			len(results), failed, error, download
+		)
+	else:
+		message = _("Project Timesheet import finished: {0} rows, {1} failed. {2}").format(
+			len(results), failed, download
+		)
+	frappe.publish_realtime("msgprint", message, user=user)
+
+
+def read_groups(file_path, results):
+	"""Stream the CSV and group valid rows by (date, company).
+
+	Returns the groups. A result entry `[line, status, message, document]` is appended
+	to `results` per input row as it is read, so it holds the lines read so far if
+	reading fails.
+	"""
+	groups = {}
+	shifts = {}  # (date, company, employee) -> [(line, ShiftInterval), ...] of the rows read so far
+
+	with open(file_path, newline="", encoding="utf-8-sig") as f:
+		for line, data in enumerate(csv.DictReader(f), start=2):
+			result = [line, "", "", ""]
+			results.append(result)
+
+			try:
+				company = (data.get("company") or "").strip()
+				if not data.get("date") or not company:
+					raise ValueError(_("Date and Company are required"))
+				date = getdate(data.get("date"))
+
+				row = {field: (data.get(field) or "").strip() or None for field in IMPORT_FIELDS}
+				for field in TIME_FIELDS:
+					time_to_minutes(row[field])
+				row["break_hours"] = flt(row["break_hours"])
+
+				validate_row(row, line, shifts.setdefault((date, company, row["employee"]), []))
+			except Exception as e:
+				result[1:3] = ["Error", str(e) or _("Invalid row")]
+				continue
+
+			groups.setdefault((date, company), []).append((row, result))
+
+	return groups
+
+
+def validate_row(row, line, employee_shifts):
+	"""Apply the row checks of Project Timesheet validation to one input row.
+
+	`employee_shifts` holds the shifts of the employee's earlier rows in the same
+	sheet; the shifts of a valid row are added to it.
+	"""
+	if not row["employee"] and not row["external_worker_name"]:
+		raise ValueError(_("Either Employee or External Worker Name is required"))
+	if row["employee"] and row["external_worker_name"]:
+		raise ValueError(_("Please select either Employee or External Worker Name, not both"))
+
+	if not row["employee"]:
+		return
+
+	intervals = [(line, interval) for interval in get_shift_intervals(frappe._dict(row))]
+	for first, second in find_overlapping_intervals(employee_shifts + intervals, key=lambda item: item[1]):
+		if first[0] == second[0] == line:
+			raise ValueError(_("The first and second shift overlap"))
+		if line in (first[0], second[0]):
+			other = second if first[0] == line else first
+			raise ValueError(
+				_("Overlaps with line {0} ({1} - {2}) for the same employee").format(
+					other[0], other[1].checkin, other[1].checkout
+				)
+			)
+
+	employee_shifts.extend(intervals)
+
+
+def import_batch(batch, submit):
+	"""Validate and insert one Project Timesheet per (date, company) group.
+
+	Overlaps with submitted timesheets are checked with one range query for the whole batch;
+	the shifts of each imported sheet are added to it for the sheets that follow.
+	"""
+	# Shifts of the batch lie between its first date and the morning after its last one
+	dates = {date for (date, _company), _rows in batch}
+	employees = {row["employee"] for _key, rows in batch for row, _result in rows if row["employee"]}
+	existing_entries = (
+		get_overlapping_intervals(employees, get_datetime(min(dates)), get_datetime(add_days(max(dates), 2)))
+		if employees
+		else []
+	)
+
+	for (date, company), rows in batch:
+		import_group(date, company, rows, submit, existing_entries)
+
+
+def import_group(date, company, rows, submit, existing_entries):
+	"""Insert (and submit) the Project Timesheet of one group, recording the result of each row.
+
+	If the document fails, each row is tried on its own to find the failing
+	ones; those get their own error and the others are imported without them.
+	"""
+	doc = make_timesheet(date, company, rows)
+	try:
+		frappe.db.savepoint("project_timesheet_import")
+		warnings = doc.get_overlap_warnings(existing_entries)
+
+		doc.flags.ignore_overlap_warnings = True
+		doc.insert()
+		if submit:
+			doc.submit()
+	except Exception as e:
+		frappe.db.rollback(save_point="project_timesheet_import")
+		message = strip_html(str(e)) or _("Could not import")
+
+		failed = get_failed_rows(date, company, rows, submit) if len(rows) > 1 else {}
+		for idx, row_message in failed.items():
+			rows[idx][1][1:3] = ["Error", row_message]
+
+		remaining = [item for idx, item in enumerate(rows) if idx not in failed]
+		if failed and remaining:
+			import_group(date, company, remaining, submit, existing_entries)
+		else:
+			for _row, result in remaining:
+				result[1:3] = ["Error", message]
+		return
+
+	existing_entries.extend(get_timesheet_intervals(doc))
+
+	warned_rows = {w["row_idx"]: w for w in warnings}
+	for idx, (_row, result) in enumerate(rows, start=1):
+		result[1] = "Imported"
+		result[3] = doc.name
+		if idx in warned_rows:
+			warning = warned_rows[idx]
+			result[2] = _("Overlaps with {0}: {1}").format(
+				warning["existing_timesheet"], warning["existing_time"]
+			)
+
+
+def get_failed_rows(date, company, rows, submit):
+	"""Message of each row (by position) that fails when imported on its own; nothing is kept"""
+	failed = {}
+	for idx, item in enumerate(rows):
+		doc = make_timesheet(date, company, [item])
+		doc.flags.ignore_overlap_warnings = True
+		try:
+			frappe.db.savepoint("project_timesheet_import_row")
+			doc.insert()
+			if submit:
+				doc.submit()
+		except Exception as e:
+			failed[idx] = strip_html(str(e)) or _("Could not import")
+		finally:
+			frappe.db.rollback(save_point="project_timesheet_import_row")
+
+	return failed
+
+
+def make_timesheet(date, company, rows):
+	doc = frappe.new_doc("Project Timesheet")
+	doc.date = date
+	doc.company = company
+	for row, _result in rows:
+		doc.append("project_timesheet_details", row)
+
+	return doc
+
+
+def get_timesheet_intervals(doc):
+	"""Shifts of an imported sheet, in the form returned by `get_overlapping_intervals`"""
+	date = getdate(doc.date)
+	return [
+		frappe._dict(
+			timesheet_name=doc.name,
+			employee=row.employee,
+			project=row.project,
+			from_time=from_time,
+			to_time=to_time,
+		)
+		for row in doc.project_timesheet_details
+		if row.employee
+		for from_time, to_time in (
+			get_shift_datetimes(date, interval) for interval in get_shift_intervals(row)
+		)
+	]
+
+
+def write_results(results):
+	"""Write the per-row results to a private file and return its URL"""
+	file_name = f"project_timesheet_import_{frappe.generate_hash(length=8)}.csv"
+	with open(frappe.get_site_path("private", "files", file_name), "w", newline="", encoding="utf-8") as f:
+		writer = csv.writer(f)
+		writer.writerow(["Line", "Status", "Message", "Project Timesheet"])
+		writer.writerows(results)
+
+	file_doc = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": file_name,
+			"file_url": f"/private/files/{file_name}",
+			"is_private": 1,
+		}
+	)
+	file_doc.insert(ignore_permissions=True)
+	return file_doc.file_url
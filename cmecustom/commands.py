@@ -0,0 +1,96 @@
+import click
+from frappe.commands import pass_context
+
+
+@click.command("rebuild-timesheet-rollup")
+@pass_context
+def rebuild_timesheet_rollup(context):
+	"""Regenerate the Project Timesheet Rollup from submitted Project Timesheets"""
+	import frappe
+
+	from cmecustom.cmecustom.doctype.project_timesheet_rollup.project_timesheet_rollup import rebuild_rollup
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			rebuild_rollup()
+			frappe.db.commit()
+		finally:
+			frappe.destroy()
+
+
+@click.command("benchmark-timesheets")
+@click.option("--company", required=True, help="Company of the generated data")
+@click.option("--sizes", help="Comma separated detail row counts (default 10000,100000,1000000)")
+@click.option("--employees", type=int, default=200)
+@click.option("--rows-per-sheet", type=int, default=50)
+@click.option("--repeat", type=int, default=3)
+@click.option("--output", help="Path of the JSON results file")
+@click.option("--keep", is_flag=True, help="Keep the last generated data set")
+@pass_context
+def benchmark_timesheets(context, company, sizes, employees, rows_per_sheet, repeat, output, keep):
+	"""Time Project Timesheet submit/cancel and reports on synthetic data (use a disposable site)"""
+	import frappe
+
+	from cmecustom.cmecustom.benchmark import run
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			run(
+				company,
+				sizes=sizes.split(",") if sizes else None,
+				employees=employees,
+				rows_per_sheet=rows_per_sheet,
+				repeat=repeat,
+				output=output,
+				keep=keep,
+			)
+		finally:
+			frappe.destroy()
+
+
+@click.command("check-timesheet-query-budget")
+@click.option("--company", required=True, help="Company of the generated Project Timesheets")
+@pass_context
+def check_timesheet_query_budget(context, company):
+	"""Fail if Project Timesheet hooks issue queries per row (N+1)"""
+	import frappe
+
+	from cmecustom.cmecustom.query_budget import check_query_budget
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			check_query_budget(company)
+		finally:
+			frappe.destroy()
+
+
+@click.command("check-timesheet-query-plans")
+@click.option("--company", required=True, help="Company of the generated data")
+@pass_context
+def check_timesheet_query_plans(context, company):
+	"""Fail if the overlap check or a report query scans a large table in full (use a disposable site)"""
+	import frappe
+
+	from cmecustom.cmecustom.query_plans import check_query_plans
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			check_query_plans(company)
+		finally:
+			frappe.destroy()
+
+
+commands = [
+	rebuild_timesheet_rollup,
+	benchmark_timesheets,
+	check_timesheet_query_budget,
+	check_timesheet_query_plans,
+]
@@ -132,13 +132,12 @@ app_license = "mit"
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# 	}
-# }
+doc_events = {
+	"Project Timesheet": {
+		"on_submit": "cmecustom.cmecustom.report_cache.invalidate_report_cache",
+		"on_cancel": "cmecustom.cmecustom.report_cache.invalidate_report_cache",
+	}
+}
 
 # Scheduled Tasks
 # ---------------
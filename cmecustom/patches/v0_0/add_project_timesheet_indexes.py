@@ -0,0 +1,8 @@
+from cmecustom.cmecustom.doctype.project_timesheet import project_timesheet
+from cmecustom.cmecustom.doctype.project_timesheet_details import project_timesheet_details
+
+
+def execute():
+	# `on_doctype_update` only runs when the DocType is synced, so apply the indexes on existing sites
+	project_timesheet.on_doctype_update()
+	project_timesheet_details.on_doctype_update()
@@ -0,0 +1,8 @@
+import frappe
+
+
+def execute():
+	# Overlap checks use Project Timesheet Interval now, nothing else filters on the date alone
+	index_name = frappe.db.get_index_name(["date", "docstatus"])
+	if frappe.db.has_index("tabProject Timesheet", index_name):
+		frappe.db.sql_ddl(f"ALTER TABLE `tabProject Timesheet` DROP INDEX `{index_name}`")
@@ -0,0 +1,22 @@
+import frappe
+
+
+def execute():
+	# Sheets cancelled with "Cancel and Amend" before the marker existed: a cancelled sheet whose
+	# rows still link submitted Timesheets, without a pending or failed cancel job, kept them
+	frappe.db.sql(
+		"""
+		UPDATE `tabProject Timesheet` pt
+		SET pt.timesheets_retained = 1
+		WHERE pt.docstatus = 2
+		AND IFNULL(pt.timesheet_creation_status, '') NOT IN ('Queued', 'In Progress', 'Failed')
+		AND EXISTS (
+			SELECT 1
+			FROM `tabProject Timesheet Details` ptd
+			INNER JOIN `tabTimesheet` ts ON ts.name = ptd.timesheet
+			WHERE ptd.parent = pt.name
+			AND ptd.parenttype = 'Project Timesheet'
+			AND ts.docstatus = 1
+		)
+	"""
+	)
@@ -0,0 +1,7 @@
+from cmecustom.cmecustom.doctype.project_timesheet_interval.project_timesheet_interval import (
+	rebuild_intervals,
+)
+
+
+def execute():
+	rebuild_intervals()
@@ -0,0 +1,5 @@
+from cmecustom.cmecustom.doctype.project_timesheet_rollup.project_timesheet_rollup import rebuild_rollup
+
+
+def execute():
+	rebuild_rollup()